@@ -1,4 +1,5 @@
 from rest_framework import permissions
+from account_admin.models import STAFF_ROLES
 
 class IsAdmin(permissions.BasePermission):
     """
@@ -26,7 +27,7 @@ class IsAdminOrOperator(permissions.BasePermission):
     Permite acceso a usuarios con rol de administrador u operador.
     """
     def has_permission(self, request, view):
-        return request.user and request.user.is_authenticated and request.user.role in ['admin', 'operator']
+        return request.user and request.user.is_authenticated and request.user.role in STAFF_ROLES
 
 class IsOwnerOrStaff(permissions.BasePermission):
     """
@@ -35,7 +36,7 @@ class IsOwnerOrStaff(permissions.BasePermission):
     """
     def has_object_permission(self, request, view, obj):
         # Admin y operadores pueden acceder a cualquier objeto
-        if request.user.role in ['admin', 'operator']:
+        if request.user.role in STAFF_ROLES:
             return True
         
         # Clientes solo pueden acceder a sus propios objetos
@@ -68,7 +69,7 @@ class AdminOperatorFullClientReadOnly(permissions.BasePermission):
         if request.method in permissions.SAFE_METHODS:
             return True
             
-        return request.user.role in ['admin', 'operator']
+        return request.user.role in STAFF_ROLES
 
 class ClientOrderPermission(permissions.BasePermission):
     """
@@ -80,7 +81,7 @@ class ClientOrderPermission(permissions.BasePermission):
             return False
             
         # Admin y operadores tienen acceso completo
-        if request.user.role in ['admin', 'operator']:
+        if request.user.role in STAFF_ROLES:
             return True
             
         # Clientes pueden crear órdenes y ver (método seguro)
@@ -92,7 +93,7 @@ class ClientOrderPermission(permissions.BasePermission):
         
     def has_object_permission(self, request, view, obj):
         # Admin y operadores pueden acceder a todas las órdenes
-        if request.user.role in ['admin', 'operator']:
+        if request.user.role in STAFF_ROLES:
             return True
             
         # Clientes solo pueden ver sus propias órdenes
@@ -116,7 +117,7 @@ class CategoryPermission(permissions.BasePermission):
         # Para modificaciones, requerir autenticación y rol adecuado
         if not request.user or not request.user.is_authenticated:
             return False
-        return request.user.role in ['admin', 'operator']
+        return request.user.role in STAFF_ROLES
 
 class ProductPermission(permissions.BasePermission):
     """
@@ -131,7 +132,7 @@ class ProductPermission(permissions.BasePermission):
         # Para modificaciones, requerir autenticación y rol adecuado
         if not request.user or not request.user.is_authenticated:
             return False
-        return request.user.role in ['admin', 'operator']
+        return request.user.role in STAFF_ROLES
     
 class OrderPermission(permissions.BasePermission):
     """
@@ -144,7 +145,7 @@ class OrderPermission(permissions.BasePermission):
             return False
             
         # Admin/operadores tienen acceso completo
-        if request.user.role in ['admin', 'operator']:
+        if request.user.role in STAFF_ROLES:
             return True
             
         # Clientes solo pueden crear órdenes y usar métodos seguros
@@ -156,7 +157,7 @@ class OrderPermission(permissions.BasePermission):
         
     def has_object_permission(self, request, view, obj):
         # Admin/operadores tienen acceso completo a nivel de objeto
-        if request.user.role in ['admin', 'operator']:
+        if request.user.role in STAFF_ROLES:
             return True
             
         # Clientes solo pueden acceder a sus propias órdenes
@@ -186,7 +187,7 @@ class CancelOrderPermission(permissions.BasePermission):
         
     def has_object_permission(self, request, view, obj):
         # Admin y operadores pueden cancelar cualquier orden
-        if request.user.role in ['admin', 'operator']:
+        if request.user.role in STAFF_ROLES:
             return True
         # Cliente solo puede cancelar sus propias órdenes
         return obj.usuario == request.user
@@ -201,7 +202,7 @@ class OrderDetailPermission(permissions.BasePermission):
             return False
             
         # Admin y operadores tienen acceso completo
-        if request.user.role in ['admin', 'operator']:
+        if request.user.role in STAFF_ROLES:
             return True
             
         # Clientes solo pueden leer
@@ -212,7 +213,7 @@ class OrderDetailPermission(permissions.BasePermission):
         
     def has_object_permission(self, request, view, obj):
         # Admin y operadores pueden acceder a todos los detalles
-        if request.user.role in ['admin', 'operator']:
+        if request.user.role in STAFF_ROLES:
             return True
             
         # Clientes solo pueden ver detalles de sus propias órdenes
@@ -232,7 +233,7 @@ class PaymentPermission(permissions.BasePermission):
             return False
             
         # Admin/operadores tienen acceso completo
-        if request.user.role in ['admin', 'operator']:
+        if request.user.role in STAFF_ROLES:
             return True
             
         # Clientes solo pueden crear pagos y usar métodos seguros
@@ -244,7 +245,7 @@ class PaymentPermission(permissions.BasePermission):
         
     def has_object_permission(self, request, view, obj):
         # Admin/operadores tienen acceso completo a nivel de objeto
-        if request.user.role in ['admin', 'operator']:
+        if request.user.role in STAFF_ROLES:
             return True
             
         # Clientes solo pueden acceder a pagos de sus propias órdenes
@@ -260,7 +261,7 @@ class ShipmentPermission(permissions.BasePermission):
             return False
             
         # Admin y operadores tienen acceso completo
-        if request.user.role in ['admin', 'operator']:
+        if request.user.role in STAFF_ROLES:
             return True
             
         # Clientes solo pueden ver envíos
@@ -271,7 +272,7 @@ class ShipmentPermission(permissions.BasePermission):
         
     def has_object_permission(self, request, view, obj):
         # Admin y operadores pueden acceder a todos los envíos
-        if request.user.role in ['admin', 'operator']:
+        if request.user.role in STAFF_ROLES:
             return True
             
         # Clientes solo pueden ver sus propios envíos
@@ -290,7 +291,7 @@ class TrackingPermission(permissions.BasePermission):
         
     def has_object_permission(self, request, view, obj):
         # Admin y operadores pueden ver tracking de cualquier envío
-        if request.user.role in ['admin', 'operator']:
+        if request.user.role in STAFF_ROLES:
             return True
         
         # Clientes solo pueden ver tracking de sus propios envíos
@@ -0,0 +1,37 @@
+"""
+Renderers personalizados para Django REST Framework
+"""
+
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# Los tipos que orjson no serializa (Decimal, datetime, lazy strings, etc.)
+# se delegan al encoder de DRF para mantener exactamente el mismo formato.
+_drf_encoder = JSONEncoder()
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer que codifica con orjson (bastante más rápido que json de la stdlib).
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            option |= orjson.OPT_INDENT_2
+
+        return orjson.dumps(data, default=_drf_encoder.default, option=option)
+
+
+class EventStreamRenderer(ORJSONRenderer):
+    """
+    Permite negociar text/event-stream (lo que envía EventSource). El stream lo
+    arma la vista; este renderer solo codifica las respuestas de error como JSON.
+    """
+    media_type = 'text/event-stream'
+    format = 'event-stream'
@@ -41,6 +41,7 @@ INSTALLED_APPS = [
     'rest_framework',
     'corsheaders',
     'drf_spectacular',
+    'django_filters',
     'market',
     'account_admin',
     'rest_framework_simplejwt',
@@ -91,6 +92,23 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# 'default' es local a cada proceso: solo para datos que se invalidan solos (clave versionada).
+# 'shared' la ven todos los workers: locks, estado de tareas y cualquier dato que se
+# invalide a mano. Requiere `python manage.py createcachetable`.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'velorum_shared_cache',
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -143,6 +161,10 @@ REST_FRAMEWORK = {
      'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ],
+     'DEFAULT_RENDERER_CLASSES': [
+        'Velorum.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
  }
 
 SIMPLE_JWT = {
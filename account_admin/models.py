@@ -1,6 +1,9 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 
+# Roles con acceso de gestión (ven y administran recursos de todos los usuarios)
+STAFF_ROLES = frozenset({'admin', 'operator'})
+
 # Create your models here.
 class User(AbstractUser):
     ROLES = [
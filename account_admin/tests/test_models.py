@@ -14,7 +14,7 @@ class UserModelTest(TestCase):
             'username': fake.unique.user_name(),
             'email': fake.unique.email(),
             'password': 'testpass123',
-            'name': fake.unique.name(),
+            'first_name': fake.first_name(),
             'address': fake.address(),
             'phone': fake.phone_number()[:15],  # Limitar a 15 caracteres
         }
@@ -29,7 +29,7 @@ class UserModelTest(TestCase):
         
         # Verificar valores por defecto
         self.assertEqual(user.role, 'client')  # Default role
-        self.assertEqual(user.name, 'Anonimo')  # Default name
+        self.assertEqual(user.first_name, '')  # Default empty
         self.assertEqual(user.address, '')  # Default empty
         self.assertEqual(user.phone, '')  # Default empty
         self.assertIsNotNone(user.register_date)  # auto_now_add=True
@@ -40,7 +40,7 @@ class UserModelTest(TestCase):
             username=self.user_data['username'],
             email=self.user_data['email'],
             password=self.user_data['password'],
-            name=self.user_data['name'],
+            first_name=self.user_data['first_name'],
             address=self.user_data['address'],
             phone=self.user_data['phone'],
             role='admin'
@@ -49,7 +49,7 @@ class UserModelTest(TestCase):
         # Verificar que todos los campos se guardaron correctamente
         self.assertEqual(user.username, self.user_data['username'])
         self.assertEqual(user.email, self.user_data['email'])
-        self.assertEqual(user.name, self.user_data['name'])
+        self.assertEqual(user.first_name, self.user_data['first_name'])
         self.assertEqual(user.address, self.user_data['address'])
         self.assertEqual(user.phone, self.user_data['phone'])
         self.assertEqual(user.role, 'admin')
@@ -106,18 +106,18 @@ class UserModelTest(TestCase):
         
         self.assertEqual(len(user.phone), 15)
         
-    def test_user_name_max_length(self):
-        """Test que verifica la longitud máxima del campo name"""
-        long_name = 'A' * 100  # Exactamente 100 caracteres
+    def test_user_first_name_max_length(self):
+        """Test que verifica la longitud máxima del campo first_name"""
+        long_name = 'A' * 150  # Exactamente 150 caracteres
         
         user = User.objects.create_user(
             username=self.user_data['username'],
             email=self.user_data['email'],
             password=self.user_data['password'],
-            name=long_name
+            first_name=long_name
         )
         
-        self.assertEqual(len(user.name), 100)
+        self.assertEqual(len(user.first_name), 150)
         
     def test_user_role_max_length(self):
         """Test que verifica la longitud máxima del campo role"""
@@ -15,7 +15,7 @@ class UserSerializerTest(TestCase):
             'username': fake.unique.user_name(),
             'email': fake.unique.email(),
             'password': 'testpass123',
-            'name': fake.name(),
+            'first_name': fake.first_name(),
             'address': fake.address(),
             'phone': fake.phone_number()[:15],
             'role': 'client'
@@ -36,7 +36,7 @@ class UserSerializerTest(TestCase):
         # Verificar que el usuario se creó correctamente
         self.assertEqual(user.username, self.user_data['username'])
         self.assertEqual(user.email, self.user_data['email'])
-        self.assertEqual(user.name, self.user_data['name'])
+        self.assertEqual(user.first_name, self.user_data['first_name'])
         self.assertEqual(user.address, self.user_data['address'])
         self.assertEqual(user.phone, self.user_data['phone'])
         self.assertEqual(user.role, self.user_data['role'])
@@ -52,7 +52,7 @@ class UserSerializerTest(TestCase):
         
         # Datos para actualizar
         update_data = {
-            'name': 'Nuevo Nombre',
+            'first_name': 'Nuevo Nombre',
             'address': 'Nueva Dirección',
             'phone': '123456789',
             'role': 'admin'
@@ -64,7 +64,7 @@ class UserSerializerTest(TestCase):
         updated_user = serializer.save()
         
         # Verificar que se actualizó correctamente
-        self.assertEqual(updated_user.name, 'Nuevo Nombre')
+        self.assertEqual(updated_user.first_name, 'Nuevo Nombre')
         self.assertEqual(updated_user.address, 'Nueva Dirección')
         self.assertEqual(updated_user.phone, '123456789')
         self.assertEqual(updated_user.role, 'admin')
@@ -75,7 +75,7 @@ class UserSerializerTest(TestCase):
             username=self.user_data['username'],
             email=self.user_data['email'],
             password=self.user_data['password'],
-            name=self.user_data['name'],
+            first_name=self.user_data['first_name'],
             address=self.user_data['address'],
             phone=self.user_data['phone'],
             role=self.user_data['role']
@@ -87,7 +87,7 @@ class UserSerializerTest(TestCase):
         # Verificar que todos los campos están presentes
         self.assertEqual(data['username'], user.username)
         self.assertEqual(data['email'], user.email)
-        self.assertEqual(data['name'], user.name)
+        self.assertEqual(data['first_name'], user.first_name)
         self.assertEqual(data['address'], user.address)
         self.assertEqual(data['phone'], user.phone)
         self.assertEqual(data['role'], user.role)
@@ -145,13 +145,13 @@ class UserSerializerTest(TestCase):
         
     def test_user_serializer_max_length_fields(self):
         """Test que verifica validación de longitud máxima de campos"""
-        # Test para name (max_length=100)
+        # Test para first_name (max_length=150)
         long_name_data = self.user_data.copy()
-        long_name_data['name'] = 'A' * 101  # Excede el límite
+        long_name_data['first_name'] = 'A' * 151  # Excede el límite
         
         serializer = UserSerializer(data=long_name_data)
         self.assertFalse(serializer.is_valid())
-        self.assertIn('name', serializer.errors)
+        self.assertIn('first_name', serializer.errors)
         
         # Test para phone (max_length=15)
         long_phone_data = self.user_data.copy()
@@ -183,7 +183,7 @@ class UserSerializerTest(TestCase):
         
         # Verificar valores por defecto
         self.assertEqual(user.role, 'client')
-        self.assertEqual(user.name, 'Anonimo')
+        self.assertEqual(user.first_name, '')
         self.assertEqual(user.address, '')
         self.assertEqual(user.phone, '')
         
@@ -199,7 +199,7 @@ class UserSerializerTest(TestCase):
         data = serializer.data
         
         # Verificar campos personalizados
-        expected_custom_fields = ['role', 'name', 'address', 'phone', 'register_date']
+        expected_custom_fields = ['role', 'address', 'phone', 'register_date']
         for field in expected_custom_fields:
             self.assertIn(field, data)
             
@@ -214,11 +214,11 @@ class UserSerializerTest(TestCase):
             username=self.user_data['username'],
             email=self.user_data['email'],
             password=self.user_data['password'],
-            name='Original Name'
+            first_name='Original Name'
         )
         
         # Actualizar solo el nombre
-        partial_data = {'name': 'Updated Name'}
+        partial_data = {'first_name': 'Updated Name'}
         
         serializer = UserSerializer(user, data=partial_data, partial=True)
         self.assertTrue(serializer.is_valid())
@@ -226,7 +226,7 @@ class UserSerializerTest(TestCase):
         updated_user = serializer.save()
         
         # Verificar que solo se actualizó el nombre
-        self.assertEqual(updated_user.name, 'Updated Name')
+        self.assertEqual(updated_user.first_name, 'Updated Name')
         self.assertEqual(updated_user.username, self.user_data['username'])  # No cambió
         self.assertEqual(updated_user.email, self.user_data['email'])  # No cambió
         
\ No newline at end of file
@@ -2,7 +2,8 @@ from django.test import TestCase
 from django.urls import reverse, resolve
 from django.contrib.auth import get_user_model
 from rest_framework.test import APITestCase
-from account_admin.views import CreateUserView, ChangeRoleView, LoginView, LogoutView
+from account_admin.views import CreateUserView, ChangeRoleView, LogoutView
+from rest_framework_simplejwt.views import TokenObtainPairView
 
 User = get_user_model()
 
@@ -29,12 +30,12 @@ class URLsTest(TestCase):
         
     def test_login_url_resolves(self):
         """Test que verifica que la URL login se resuelve correctamente"""
-        url = reverse('login')
+        url = reverse('token_obtain_pair')
         self.assertEqual(url, '/api/login/')  # Agregar /api/
         
         # Verificar que resuelve a la vista correcta
         resolver = resolve(url)
-        self.assertEqual(resolver.func.view_class, LoginView)
+        self.assertEqual(resolver.func.view_class, TokenObtainPairView)
         
     def test_logout_url_resolves(self):
         """Test que verifica que la URL logout se resuelve correctamente"""
@@ -89,7 +90,7 @@ class URLPatternTest(APITestCase):
         
     def test_login_url_accessible(self):
         """Test que verifica que la URL login es accesible"""
-        url = reverse('login')
+        url = reverse('token_obtain_pair')
         response = self.client.get(url)
         
         # Debería dar 405 (Method Not Allowed) para GET, no 404
@@ -116,7 +117,7 @@ class URLNameTest(TestCase):
     
     def test_all_url_names_exist(self):
         """Test que verifica que todos los nombres de URL existen"""
-        url_names = ['create-user', 'change-role', 'login', 'logout']
+        url_names = ['create-user', 'change-role', 'token_obtain_pair', 'logout']
         
         for url_name in url_names:
             with self.subTest(url_name=url_name):
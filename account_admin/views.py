@@ -20,7 +20,7 @@ class CreateUserView(APIView):
         # Si el usuario está autenticado, mantener lógica de roles
         if hasattr(request, 'user') and request.user.is_authenticated:
             user = request.user
-            if user.role not in ['admin', 'operator']:
+            if user.role not in STAFF_ROLES:
                 return Response(
                     {"error": "No tienes permiso para crear usuarios."},
                     status=status.HTTP_403_FORBIDDEN
@@ -100,9 +100,9 @@ def user_profile(request):
                 'role': user_role,
                 'original_role': user.role,
                 'permissions': {
-                    'can_access_admin': user.role in ['admin', 'operator'] or user.is_superuser,
+                    'can_access_admin': user.role in STAFF_ROLES or user.is_superuser,
                     'can_manage_products': user.role == 'admin' or user.is_superuser,
-                    'can_view_orders': user.role in ['admin', 'operator'] or user.is_superuser,
+                    'can_view_orders': user.role in STAFF_ROLES or user.is_superuser,
                     'can_manage_users': user.role == 'admin' or user.is_superuser
                 }
             }
@@ -161,9 +161,9 @@ def user_profile(request):
                 'role': user_role,
                 'original_role': user.role,
                 'permissions': {
-                    'can_access_admin': user.role in ['admin', 'operator'] or user.is_superuser,
+                    'can_access_admin': user.role in STAFF_ROLES or user.is_superuser,
                     'can_manage_products': user.role == 'admin' or user.is_superuser,
-                    'can_view_orders': user.role in ['admin', 'operator'] or user.is_superuser,
+                    'can_view_orders': user.role in STAFF_ROLES or user.is_superuser,
                     'can_manage_users': user.role == 'admin' or user.is_superuser
                 }
             }
@@ -296,10 +296,11 @@ def manage_user(request, user_id):
                 
                 # Prevenir que se quite el último admin
                 if target_user.role == 'admin' and data['role'] != 'admin':
-                    admin_count = User.objects.filter(role='admin').count()
-                    superuser_count = User.objects.filter(is_superuser=True).count()
+                    # Basta saber si existe otro admin o algún superusuario (sin contar filas)
+                    otro_admin = User.objects.filter(role='admin').exclude(pk=target_user.pk).exists()
+                    hay_superusuario = User.objects.filter(is_superuser=True).exists()
                     
-                    if admin_count == 1 and superuser_count == 0:
+                    if not otro_admin and not hay_superusuario:
                         return Response(
                             {'error': 'No se puede quitar el último administrador del sistema'}, 
                             status=status.HTTP_400_BAD_REQUEST
@@ -351,10 +352,11 @@ def manage_user(request, user_id):
             
             # Prevenir eliminar el último admin
             if target_user.role == 'admin':
-                admin_count = User.objects.filter(role='admin').count()
-                superuser_count = User.objects.filter(is_superuser=True).count()
+                # Basta saber si existe otro admin o algún superusuario (sin contar filas)
+                otro_admin = User.objects.filter(role='admin').exclude(pk=target_user.pk).exists()
+                hay_superusuario = User.objects.filter(is_superuser=True).exists()
                 
-                if admin_count == 1 and superuser_count == 0:
+                if not otro_admin and not hay_superusuario:
                     return Response(
                         {'error': 'No se puede eliminar el último administrador del sistema'}, 
                         status=status.HTTP_400_BAD_REQUEST
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class MarketConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'market'
+
+    def ready(self):
+        # Registrar las señales del marketplace
+        from . import signals  # noqa: F401
@@ -0,0 +1,42 @@
+"""
+Decoradores reutilizables para las vistas del marketplace
+"""
+
+from functools import wraps
+
+from django.core.cache import caches
+from rest_framework.response import Response
+
+# Compartida entre workers: un reintento puede llegar a otro proceso
+cache = caches['shared']
+
+# Errores transitorios (conflicto, lock, rate limit): un reintento puede salir distinto
+NO_REPETIBLES = {408, 409, 423, 425, 429}
+
+
+def idempotent(name, ttl=3600):
+    """
+    Respeta el header Idempotency-Key: la primera respuesta (status y datos) queda en
+    la caché y los reintentos con la misma clave la reciben sin volver a ejecutar la vista.
+    Va debajo de @api_view, donde la vista ya recibe el Request de DRF.
+    Solo se guardan los éxitos y los 4xx deterministas (validación); los 5xx y los
+    NO_REPETIBLES (p. ej. el 409 de una sincronización en curso) vuelven a ejecutar la vista.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            key = request.headers.get('Idempotency-Key')
+            if not key:
+                return view(request, *args, **kwargs)
+            # La clave es por usuario: otro admin con la misma clave no recibe esta respuesta
+            cache_key = f'idem:{name}:{request.user.pk}:{key}'
+            cached = cache.get(cache_key)
+            if cached is not None:
+                status_code, data = cached
+                return Response(data, status=status_code)
+            response = view(request, *args, **kwargs)
+            if response.status_code < 500 and response.status_code not in NO_REPETIBLES:
+                cache.set(cache_key, (response.status_code, response.data), ttl)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,27 @@
+"""
+Filtros de query params para los ViewSets del marketplace (django-filter)
+"""
+
+from django_filters import rest_framework as filters
+
+from .models import Category, Product
+
+
+class CategoryFilter(filters.FilterSet):
+    nombre = filters.CharFilter(lookup_expr='icontains')
+
+    class Meta:
+        model = Category
+        fields = ['nombre']
+
+
+class ProductFilter(filters.FilterSet):
+    """?nombre (contiene), ?categoria (id), ?precio_min y ?precio_max"""
+    nombre = filters.CharFilter(lookup_expr='icontains')
+    categoria = filters.NumberFilter(field_name='categoria_id')
+    precio_min = filters.NumberFilter(field_name='precio', lookup_expr='gte')
+    precio_max = filters.NumberFilter(field_name='precio', lookup_expr='lte')
+
+    class Meta:
+        model = Product
+        fields = ['nombre', 'categoria', 'precio_min', 'precio_max']
@@ -0,0 +1,31 @@
+"""
+Sincroniza los productos externos fuera del proceso web.
+Lo lanza POST /api/market/sync-external/ con --task-id; sin él sirve para cron.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from market.tasks import ejecutar_sincronizacion, sincronizacion_en_curso, tomar_lock_sincronizacion
+
+
+class Command(BaseCommand):
+    help = 'Sincroniza los productos externos publicando el estado en la caché compartida'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--task-id',
+            help='Id de una tarea que ya tomó el lock (lo pasa lanzar_sincronizacion)'
+        )
+
+    def handle(self, *args, **options):
+        task_id = options['task_id']
+        if task_id is None:
+            task_id = tomar_lock_sincronizacion()
+            if task_id is None:
+                raise CommandError(f'Ya hay una sincronización en curso: {sincronizacion_en_curso()}')
+        elif sincronizacion_en_curso() != task_id:
+            raise CommandError(f'La tarea {task_id} no tiene el lock de sincronización')
+
+        estado = ejecutar_sincronizacion(task_id)
+        self.stdout.write(f"{task_id}: {estado['state']}")
+        if estado['state'] != 'SUCCESS':
+            raise CommandError(str(estado['result']))
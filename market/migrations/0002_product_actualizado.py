@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-15 22:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='actualizado',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
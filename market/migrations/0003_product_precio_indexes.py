@@ -0,0 +1,21 @@
+# Generated by Django 5.2 on 2026-10-15 23:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0002_product_actualizado'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['precio'], name='market_prod_precio_bb9243_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['categoria', 'precio'], name='market_prod_categor_4686b4_idx'),
+        ),
+    ]
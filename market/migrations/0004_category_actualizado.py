@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-16 00:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0003_product_precio_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='actualizado',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
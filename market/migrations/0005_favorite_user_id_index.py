@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-16 01:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0004_category_actualizado'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(fields=['user', '-id'], name='market_favo_user_id_61f7c0_idx'),
+        ),
+    ]
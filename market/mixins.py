@@ -0,0 +1,138 @@
+"""
+Mixins reutilizables para los ViewSets del marketplace
+"""
+
+from django.core.exceptions import FieldDoesNotExist
+from django.http import StreamingHttpResponse
+from rest_framework import serializers
+from rest_framework.decorators import action
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class ExportMixin:
+    """
+    Agrega la acción GET <recurso>/export/ que devuelve todos los registros
+    como un array JSON en streaming. El queryset se recorre por bloques con
+    iterator(), así la memoria no crece con la cantidad de filas.
+    """
+    export_chunk_size = 500
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Exporta todos los registros visibles para el usuario"""
+        queryset = self.filter_queryset(self.get_queryset())
+        # Un único serializer: los campos se construyen una vez para todo el export
+        serializer = self.get_serializer()
+        return StreamingHttpResponse(
+            self._export_stream(queryset, serializer),
+            content_type='application/json'
+        )
+
+    def _export_stream(self, queryset, serializer):
+        encoder = JSONEncoder()
+        yield '['
+        # chunk_size explícito: Django lo exige para combinar iterator() con prefetch_related
+        for index, obj in enumerate(queryset.iterator(chunk_size=self.export_chunk_size)):
+            if index:
+                yield ','
+            yield encoder.encode(serializer.to_representation(obj))
+        yield ']'
+
+
+class AutoPrefetchViewSetMixin:
+    """
+    Aplica select_related/prefetch_related a partir de los campos del serializer.
+    Recorre el `source` de cada campo contra el _meta del modelo: las FK/OneToOne
+    van a select_related y las relaciones inversas/M2M a prefetch_related.
+
+    Se engancha en filter_queryset (usado por list, get_object y export) para
+    correr después del get_queryset de cada ViewSet y respetar sus Prefetch propios.
+    """
+    # (serializer_class, model) -> (select_related, prefetch_related)
+    _auto_prefetch_cache = {}
+
+    def filter_queryset(self, queryset):
+        return self.auto_prefetch(super().filter_queryset(queryset))
+
+    def auto_prefetch(self, queryset):
+        serializer_class = self.get_serializer_class()
+        key = (serializer_class, queryset.model)
+        if key not in self._auto_prefetch_cache:
+            serializer = serializer_class(context=self.get_serializer_context())
+            select, prefetch = set(), set()
+            _collect_related_paths(serializer, queryset.model, [], True, select, prefetch)
+            self._auto_prefetch_cache[key] = (_prune_prefixes(select), _prune_prefixes(prefetch))
+        select, prefetch = self._auto_prefetch_cache[key]
+
+        existing = [
+            getattr(lookup, 'prefetch_to', lookup)
+            for lookup in queryset._prefetch_related_lookups
+        ]
+        only_fields, defer = queryset.query.deferred_loading
+        if not defer:
+            # Con .only() no se puede hacer select_related sobre una FK diferida
+            select = [path for path in select if path.split('__')[0] in only_fields]
+        # Un select_related sobre una relación ya prefetcheada anularía el Prefetch propio
+        select = [
+            path for path in select
+            if not any(path == done or path.startswith(done + '__') for done in existing)
+        ]
+        prefetch = [
+            path for path in prefetch
+            if not any(path == done or done.startswith(path + '__') for done in existing)
+        ]
+
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        return queryset
+
+
+def _collect_related_paths(serializer, model, prefix, is_select, select, prefetch):
+    """Acumula en select/prefetch las rutas de relaciones que lee el serializer"""
+    for field in serializer.fields.values():
+        if field.write_only or field.source == '*':
+            continue
+        target = field.child if isinstance(field, serializers.ListSerializer) else field
+        pk_only = isinstance(target, serializers.RelatedField) and target.use_pk_only_optimization()
+
+        resolved = _resolve_path(model, prefix, is_select, field.source_attrs, pk_only, select, prefetch)
+        if resolved and isinstance(target, serializers.ModelSerializer):
+            _collect_related_paths(target, *resolved, select, prefetch)
+
+    # Relaciones leídas fuera de los campos (p. ej. en to_representation)
+    meta = getattr(serializer, 'Meta', None)
+    for lookup in getattr(meta, 'auto_prefetch_related', ()):
+        _resolve_path(model, prefix, is_select, lookup.split('__'), False, select, prefetch)
+
+
+def _resolve_path(model, prefix, is_select, attrs, pk_only, select, prefetch):
+    """
+    Recorre attrs contra el _meta del modelo registrando cada relación.
+    Retorna (modelo, ruta, es_select) si attrs termina en una relación.
+    """
+    current_model, path, select_path = model, list(prefix), is_select
+    for index, attr in enumerate(attrs):
+        try:
+            model_field = current_model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            return None  # propiedad o método del modelo
+        if not model_field.is_relation:
+            return None
+        if pk_only and index == len(attrs) - 1:
+            return None  # solo se lee el *_id, no hace falta el objeto relacionado
+        path.append(attr)
+        if model_field.one_to_many or model_field.many_to_many:
+            select_path = False
+        (select if select_path else prefetch).add('__'.join(path))
+        current_model = model_field.related_model
+    return (current_model, path, select_path) if path else None
+
+
+def _prune_prefixes(paths):
+    """Descarta rutas implícitas en otras más largas ('a' si existe 'a__b')"""
+    return [
+        path for path in sorted(paths)
+        if not any(other.startswith(path + '__') for other in paths)
+    ]
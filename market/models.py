@@ -1,13 +1,45 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 from django.conf import settings
+from django.core.cache import caches
 from account_admin.models import User
+import uuid
+
+# Versión del catálogo (productos y categorías): cambia con cada escritura y da el ETag
+# de los listados sin consultar las tablas. Va en la caché compartida entre workers.
+CATALOGO_VERSION_KEY = 'catalogo:version'
+
+def version_catalogo():
+    return caches['shared'].get_or_set(CATALOGO_VERSION_KEY, lambda: uuid.uuid4().hex, None)
+
+def tocar_version_catalogo():
+    caches['shared'].set(CATALOGO_VERSION_KEY, uuid.uuid4().hex, None)
+
+def programar_version_catalogo():
+    """
+    Invalida el ETag de los listados al confirmar la transacción en curso, una sola vez
+    por transacción (fuera de una transacción, en el acto). Llamarla también en escrituras
+    sin señales (update, bulk_update).
+    """
+    pendientes = transaction.get_connection().run_on_commit
+    if not any(isinstance(funcion, _TocarVersion) and not funcion.ejecutado for _, funcion, _ in pendientes):
+        transaction.on_commit(_TocarVersion())
+
+class _TocarVersion:
+    """Callback de on_commit que recuerda si ya corrió, para no programarlo dos veces"""
+    ejecutado = False
+
+    def __call__(self):
+        self.ejecutado = True
+        tocar_version_catalogo()
 
 # Create your models here.
 class Category(models.Model):
     nombre = models.CharField(max_length=110, unique=True)
     descripcion = models.TextField(blank=True)
+    actualizado = models.DateTimeField(auto_now=True)  # Para el ETag de los listados
 
     def __str__(self):
         return self.nombre
@@ -16,6 +48,30 @@ class Category(models.Model):
         verbose_name = "Category"  
         verbose_name_plural = "Categories"  
 
+class ProductQuerySet(models.QuerySet):
+    def con_campos_calculados(self):
+        """
+        Calcula en la base de datos los campos derivados (stock_disponible, precio_final)
+        para que las propiedades del modelo no se recalculen en Python por cada fila.
+        """
+        return self.annotate(
+            _stock_disponible=models.Case(
+                models.When(stock_ilimitado=True, then=models.Value(999999)),
+                models.When(stock_vendido__gte=models.F('stock_proveedor'), then=models.Value(0)),
+                default=models.F('stock_proveedor') - models.F('stock_vendido'),
+                output_field=models.IntegerField()
+            ),
+            _precio_final=models.Case(
+                models.When(
+                    en_oferta=True,
+                    precio_oferta_proveedor__gt=0,
+                    then=models.F('precio_oferta_proveedor') * 2  # Markup del 100%
+                ),
+                default=models.F('precio'),
+                output_field=models.DecimalField(max_digits=10, decimal_places=2)
+            )
+        )
+
 class Product(models.Model):
     # Información básica
     nombre = models.CharField(max_length=250)
@@ -49,10 +105,16 @@ class Product(models.Model):
     
     # Control
     desactivado = models.BooleanField(default=False)
+    actualizado = models.DateTimeField(auto_now=True)  # Versión del producto (caché de serialización)
+
+    objects = ProductQuerySet.as_manager()
 
     @property
     def stock_disponible(self):
         """Stock disponible para vender (stock_proveedor - stock_vendido)"""
+        # Valor anotado por ProductQuerySet.con_campos_calculados()
+        if hasattr(self, '_stock_disponible'):
+            return self._stock_disponible
         if self.stock_ilimitado:
             return 999999
         return max(0, self.stock_proveedor - self.stock_vendido)
@@ -72,6 +134,8 @@ class Product(models.Model):
     @property
     def precio_final(self):
         """Precio que ve el cliente (considera ofertas)"""
+        if hasattr(self, '_precio_final'):
+            return self._precio_final
         if self.en_oferta and self.precio_oferta_proveedor:
             return self.precio_oferta_proveedor * 2  # Markup del 100%
         return self.precio
@@ -98,6 +162,9 @@ class Product(models.Model):
         indexes = [
             models.Index(fields=['external_id']),
             models.Index(fields=['slug']),
+            # Filtros del catálogo: rango de precio, solo o dentro de una categoría
+            models.Index(fields=['precio']),
+            models.Index(fields=['categoria', 'precio']),
         ]  
 
 class Order(models.Model):
@@ -118,8 +185,9 @@ class Order(models.Model):
     total = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
 
     def total_update(self):
-        self.total = sum(detalle.subtotal for detalle in self.detalles.all())
-        self.save()
+        # Suma en la base (ignora cualquier prefetch de detalles) y escribe solo la columna total
+        self.total = self.detalles.aggregate(total=models.Sum('subtotal'))['total'] or 0
+        Order.objects.filter(pk=self.pk).update(total=self.total)
 
     def save(self, *args, **kwargs):
         if self.pk:  # Solo si el pedido ya existe
@@ -131,7 +199,7 @@ class Order(models.Model):
                     # Asegurar que no sea negativo
                     if detalle.producto.stock_vendido < 0:
                         detalle.producto.stock_vendido = 0
-                    detalle.producto.save()
+                    detalle.producto.save(update_fields=['stock_vendido', 'actualizado'])
 
         super().save(*args, **kwargs)
 
@@ -204,17 +272,17 @@ class Pay(models.Model):
         if self.estado not in ['pendiente', 'en_revision']:
             return
         self.estado = 'completado'
-        self.save()
+        self.save(update_fields=['estado', 'actualizado'])
         # Actualizar estado del pedido si aún estaba pendiente
         if self.pedido.estado in ['pendiente', 'en_revision']:
             self.pedido.estado = 'pagado'
-            self.pedido.save()
+            self.pedido.save(update_fields=['estado'])
 
     def fail(self):
         if self.estado not in ['pendiente', 'en_revision']:
             return
         self.estado = 'fallido'
-        self.save()
+        self.save(update_fields=['estado', 'actualizado'])
 
     def __str__(self):
         return f"Pago de {self.monto_pagado} - {self.metodo} ({self.estado})"
@@ -262,6 +330,17 @@ class Cart(models.Model):
         """Obtiene la cantidad total de items en el carrito"""
         return sum(item.cantidad for item in self.items.all())
     
+    def resumen(self):
+        """Cantidad de unidades y total del carrito en una sola consulta"""
+        return self.items.aggregate(
+            cantidad_items=Coalesce(models.Sum('cantidad'), models.Value(0)),
+            total=Coalesce(
+                models.Sum(models.F('cantidad') * models.F('producto__precio')),
+                models.Value(0),
+                output_field=models.DecimalField(max_digits=10, decimal_places=2)
+            )
+        )
+
     def limpiar(self):
         """Elimina todos los items del carrito"""
         self.items.all().delete()
@@ -298,6 +377,10 @@ class Favorite(models.Model):
         constraints = [
             models.UniqueConstraint(fields=['user', 'product'], name='uniq_favorite_user_product')
         ]
+        indexes = [
+            # Paginación por cursor de los favoritos de un usuario (orden -id)
+            models.Index(fields=['user', '-id']),
+        ]
         ordering = ['-created_at']
 
     def __str__(self):
@@ -0,0 +1,40 @@
+"""
+Clases de paginación del marketplace
+"""
+
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class ProductPagination(PageNumberPagination):
+    """
+    Paginación del catálogo (24 productos por página, ?page_size hasta 100).
+    Se activa cuando el cliente envía ?page o ?page_size; sin esos parámetros
+    la respuesta sigue siendo la lista completa que ya consume el frontend.
+    """
+    page_size = 24
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.page_query_param not in params and self.page_size_query_param not in params:
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+
+class FavoriteCursorPagination(CursorPagination):
+    """
+    Paginación por cursor de los favoritos (orden -id, 50 por página, ?page_size hasta 200).
+    Cada página es un rango sobre el índice (user, -id), sin OFFSET.
+    Igual que en el catálogo, solo se activa con ?cursor o ?page_size.
+    """
+    ordering = '-id'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+        return super().paginate_queryset(queryset, request, view)
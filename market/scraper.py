@@ -5,9 +5,10 @@ Módulo de scraping para sincronizar productos externos
 import requests
 from bs4 import BeautifulSoup
 import re
+from django.db import transaction
 from django.utils import timezone
 from django.utils.text import slugify
-from market.models import Product, Category
+from market.models import Product, Category, programar_version_catalogo
 import logging
 
 logger = logging.getLogger(__name__)
@@ -159,94 +160,148 @@ def scrape_category(session, csrf_token, category_ids, category_name):
     return productos
 
 
-def process_product_data(producto_json, categoria, subcategorias_map=None):
+# Campos que la sincronización sobrescribe en productos existentes (bulk_update)
+CAMPOS_SINCRONIZADOS = [
+    'nombre', 'descripcion', 'categoria', 'precio', 'precio_proveedor', 'stock_proveedor',
+    'stock_ilimitado', 'en_oferta', 'precio_oferta_proveedor', 'imagenes', 'external_url',
+    'last_sync', 'actualizado',
+]
+# Filas por UPDATE; Django lo reduce si el motor admite menos parámetros
+SYNC_BATCH_SIZE = 10000
+
+
+def _datos_producto(producto_json, categoria):
     """
-    Procesa el JSON de un producto y lo crea/actualiza en la BD
+    Extrae del JSON del proveedor los valores a guardar.
     
-    Args:
-        producto_json: Datos del producto en JSON
-        categoria: Instancia de Category
-        subcategorias_map: Diccionario {external_id: nombre_subcategoria}
+    Returns:
+        tuple: (external_id, valores sin 'precio', precio_calculado)
+    """
+    external_id = str(producto_json['idProductos'])
+    nombre = producto_json['p_nombre']
+    descripcion = producto_json.get('p_descripcion', '')
+    
+    # Stock
+    stock_info = producto_json['stock'][0] if producto_json.get('stock') else {}
+    stock_proveedor = stock_info.get('s_cantidad', 0)
+    stock_ilimitado = stock_info.get('s_ilimitado', 0) == 1
+    precio_proveedor = stock_info.get('s_precio', producto_json.get('p_precio', 0))
+    
+    # Ofertas
+    en_oferta = producto_json.get('p_oferta', 0) == 1
+    precio_oferta_proveedor = producto_json.get('p_precio_oferta', 0) if en_oferta else None
+    
+    # Imágenes
+    imagenes_json = producto_json.get('imagenes', [])
+    imagenes_urls = []
+    for img in imagenes_json:
+        i_link = img.get('i_link', '')
+        # Si ya es una URL completa, usarla directamente
+        if i_link.startswith('http'):
+            imagenes_urls.append(i_link)
+        else:
+            # Si es solo el path, agregar el CDN base
+            imagenes_urls.append(f"{CDN_BASE}/{i_link}")
+    
+    # URL del producto original
+    p_link = producto_json.get('p_link', '')
+    external_url = f"{CATEGORIAS_CONFIG[categoria.nombre.lower()]['url']}/{p_link}" if p_link else None
+    
+    # Calcular precio (markup del 100%)
+    precio_calculado = float(precio_proveedor) * 2
+    
+    valores = {
+        'nombre': nombre,
+        'descripcion': descripcion,
+        'categoria': categoria,
+        'precio_proveedor': precio_proveedor,
+        'stock_proveedor': stock_proveedor,
+        'stock_ilimitado': stock_ilimitado,
+        'en_oferta': en_oferta,
+        'precio_oferta_proveedor': precio_oferta_proveedor,
+        'imagenes': imagenes_urls,
+        'external_url': external_url,
+        'last_sync': timezone.now(),
+    }
+    return external_id, valores, precio_calculado
+
+
+def process_products_batch(productos_json, categoria):
+    """
+    Crea/actualiza todos los productos de una categoría.
+    Los existentes se leen con una consulta (in_bulk por external_id) y se
+    escriben con bulk_update por lotes; solo los nuevos se insertan uno a uno
+    (save() genera el slug único).
     
     Returns:
-        tuple: (producto, created)
+        tuple: (external_ids procesados, nuevos, actualizados, cantidad de errores)
     """
-    try:
-        external_id = str(producto_json['idProductos'])
-        nombre = producto_json['p_nombre']
-        descripcion = producto_json.get('p_descripcion', '')
-        
-        # Stock
-        stock_info = producto_json['stock'][0] if producto_json.get('stock') else {}
-        stock_proveedor = stock_info.get('s_cantidad', 0)
-        stock_ilimitado = stock_info.get('s_ilimitado', 0) == 1
-        precio_proveedor = stock_info.get('s_precio', producto_json.get('p_precio', 0))
-        
-        # Ofertas
-        en_oferta = producto_json.get('p_oferta', 0) == 1
-        precio_oferta_proveedor = producto_json.get('p_precio_oferta', 0) if en_oferta else None
-        
-        # Imágenes
-        imagenes_json = producto_json.get('imagenes', [])
-        imagenes_urls = []
-        for img in imagenes_json:
-            i_link = img.get('i_link', '')
-            # Si ya es una URL completa, usarla directamente
-            if i_link.startswith('http'):
-                imagenes_urls.append(i_link)
-            else:
-                # Si es solo el path, agregar el CDN base
-                imagenes_urls.append(f"{CDN_BASE}/{i_link}")
-        
-        # URL del producto original
-        p_link = producto_json.get('p_link', '')
-        external_url = f"{CATEGORIAS_CONFIG[categoria.nombre.lower()]['url']}/{p_link}" if p_link else None
-        
-        # Calcular precio (markup del 100%)
-        precio_calculado = float(precio_proveedor) * 2
-        
-        # Verificar si el producto ya existe
+    datos = {}
+    errores = 0
+    for producto_json in productos_json:
         try:
-            producto_existente = Product.objects.get(external_id=external_id)
-            # Si existe y tiene precio manual, mantenerlo
-            if producto_existente.precio_manual:
-                precio_final = producto_existente.precio
-            else:
-                precio_final = precio_calculado
-        except Product.DoesNotExist:
-            # Si no existe, usar el precio calculado
-            precio_final = precio_calculado
-        
-        # Buscar o crear producto
-        producto, created = Product.objects.update_or_create(
-            external_id=external_id,
-            defaults={
-                'nombre': nombre,
-                'descripcion': descripcion,
-                'categoria': categoria,
-                'precio': precio_final,
-                'precio_proveedor': precio_proveedor,
-                'stock_proveedor': stock_proveedor,
-                'stock_ilimitado': stock_ilimitado,
-                'en_oferta': en_oferta,
-                'precio_oferta_proveedor': precio_oferta_proveedor,
-                'imagenes': imagenes_urls,
-                'external_url': external_url,
-                'last_sync': timezone.now(),
-            }
-        )
-        
-        return producto, created
-        
-    except Exception as e:
-        logger.error(f"Error procesando producto {producto_json.get('p_nombre', 'unknown')}: {str(e)}")
-        return None, False
+            external_id, valores, precio_calculado = _datos_producto(producto_json, categoria)
+        except Exception as e:
+            logger.error(f"Error procesando producto {producto_json.get('p_nombre', 'unknown')}: {str(e)}")
+            errores += 1
+            continue
+        # Un id repetido en la categoría se guarda una sola vez (gana el último, como antes)
+        datos[external_id] = (valores, precio_calculado)
+    
+    with transaction.atomic():
+        # select_for_update: un precio manual fijado mientras corre el lote no se pisa
+        # Solo las columnas que se leen: el resto (descripción, imágenes...) se sobrescribe igual
+        existentes = Product.objects.select_for_update().only(
+            'id', 'external_id', 'precio', 'precio_manual'
+        ).in_bulk(list(datos), field_name='external_id')
+        return _guardar_lote(datos, existentes, categoria, errores)
+
 
+def _guardar_lote(datos, existentes, categoria, errores):
+    """Escribe el lote ya parseado; corre dentro de la transacción de process_products_batch"""
+    ahora = timezone.now()
+    a_actualizar = []
+    nuevos = 0
+    procesados = []
+    for external_id, (valores, precio_calculado) in datos.items():
+        producto = existentes.get(external_id)
+        if producto is None:
+            try:
+                # Savepoint: un alta fallida no invalida la transacción del lote
+                with transaction.atomic():
+                    producto = Product.objects.create(external_id=external_id, precio=precio_calculado, **valores)
+            except Exception as e:
+                logger.error(f"Error creando producto {valores['nombre']}: {str(e)}")
+                errores += 1
+                continue
+            nuevos += 1
+            logger.info(f"✅ Producto NUEVO: {producto.nombre}")
+        else:
+            for campo, valor in valores.items():
+                setattr(producto, campo, valor)
+            # Si tiene precio manual, mantenerlo
+            if not producto.precio_manual:
+                producto.precio = precio_calculado
+            # bulk_update no aplica auto_now
+            producto.actualizado = ahora
+            a_actualizar.append(producto)
+            logger.debug(f"🔄 Producto actualizado: {producto.nombre}")
+        procesados.append(external_id)
+    
+    Product.objects.bulk_update(a_actualizar, CAMPOS_SINCRONIZADOS, batch_size=SYNC_BATCH_SIZE)
+    if a_actualizar:
+        programar_version_catalogo()
+    return procesados, nuevos, len(a_actualizar), errores
 
-def sync_external_products():
+
+def sync_external_products(on_progress=None):
     """
     Función principal de sincronización
     
+    Args:
+        on_progress: callable opcional; recibe los contadores parciales
+            después de cada categoría
+    
     Returns:
         dict: Estadísticas de la sincronización
     """
@@ -289,29 +344,27 @@ def sync_external_products():
                 cat_config['categoria_nombre']
             )
             
-            # Obtener mapa de subcategorías para esta categoría
-            subcategorias_map = cat_config.get('subcategorias', {})
-            
-            # Procesar cada producto
-            for prod_json in productos_json:
-                producto, created = process_product_data(prod_json, categoria, subcategorias_map)
-                
-                if producto:
-                    productos_encontrados.append(producto.external_id)
-                    
-                    if created:
-                        productos_nuevos += 1
-                        logger.info(f"✅ Producto NUEVO: {producto.nombre}")
-                    else:
-                        productos_actualizados += 1
-                        logger.debug(f"🔄 Producto actualizado: {producto.nombre}")
-                else:
-                    errores.append(f"Error procesando producto en {cat_config['categoria_nombre']}")
+            # Procesar los productos de la categoría en lote
+            procesados, nuevos, actualizados, fallidos = process_products_batch(productos_json, categoria)
+            productos_encontrados.extend(procesados)
+            productos_nuevos += nuevos
+            productos_actualizados += actualizados
+            errores.extend(
+                [f"Error procesando producto en {cat_config['categoria_nombre']}"] * fallidos
+            )
             
         except Exception as e:
             error_msg = f"Error en categoría {cat_config['categoria_nombre']}: {str(e)}"
             logger.error(error_msg)
             errores.append(error_msg)
+        
+        if on_progress:
+            on_progress({
+                'categoria': cat_config['categoria_nombre'],
+                'nuevos': productos_nuevos,
+                'actualizados': productos_actualizados,
+                'errores': len(errores),
+            })
     
     # Marcar como no disponibles los productos que ya no existen
     productos_desaparecidos = Product.objects.filter(
@@ -320,9 +373,10 @@ def sync_external_products():
         external_id__in=productos_encontrados
     )
     
-    count_desaparecidos = productos_desaparecidos.count()
+    # update() devuelve las filas afectadas: no hace falta un COUNT previo
+    count_desaparecidos = productos_desaparecidos.update(desactivado=True, actualizado=timezone.now())
     if count_desaparecidos > 0:
-        productos_desaparecidos.update(desactivado=True)
+        programar_version_catalogo()
         logger.info(f"⚠️ {count_desaparecidos} productos marcados como desactivados (ya no existen en proveedor)")
     
     # Estadísticas finales
@@ -0,0 +1,32 @@
+"""
+Señales del marketplace
+"""
+
+from django.db.models import Sum
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from market.models import Category, Order, OrderDetail, Product, programar_version_catalogo
+
+
+@receiver([post_save, post_delete], sender=OrderDetail)
+def actualizar_total_pedido(sender, instance, **kwargs):
+    """
+    Mantiene Order.total (columna desnormalizada) igual a la suma de los
+    subtotales de sus detalles, para que leer el total no requiera recalcularlo.
+    """
+    # Al borrar el pedido completo, sus detalles se eliminan en cascada: no hay nada que actualizar
+    if isinstance(kwargs.get('origin'), Order):
+        return
+    # Un save(update_fields=...) que no toca el subtotal no cambia el total
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and 'subtotal' not in update_fields:
+        return
+    total = OrderDetail.objects.filter(pedido_id=instance.pedido_id).aggregate(total=Sum('subtotal'))['total']
+    Order.objects.filter(pk=instance.pedido_id).update(total=total or 0)
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Category)
+def invalidar_etag_catalogo(sender, **kwargs):
+    """Cambia la versión del catálogo que usan los ETag de los listados de productos y categorías"""
+    programar_version_catalogo()
@@ -0,0 +1,129 @@
+"""
+Tareas en segundo plano del marketplace
+"""
+
+import subprocess
+import sys
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from market.scraper import sync_external_products
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Caché compartida entre procesos: el lock y el estado deben verlos todos los workers
+cache = caches['shared']
+
+# Estado de cada ejecución: lo consulta el admin mientras la sincronización corre
+SYNC_STATUS_TIMEOUT = 3600
+# Mutex entre ejecuciones manuales; el timeout libera el lock si el proceso muere
+SYNC_LOCK_KEY = 'sync_external_products:lock'
+SYNC_LOCK_TIMEOUT = 600
+# Último resultado, para responder sin volver a scrapear
+SYNC_LAST_KEY = 'sync_external_products:last'
+SYNC_LAST_TIMEOUT = 300
+# Estados con los que una sincronización ya no cambia
+SYNC_ESTADOS_FINALES = ('SUCCESS', 'FAILURE')
+
+
+def sync_status_cache_key(task_id):
+    return f'sync_external_products:task:{task_id}'
+
+
+def get_sync_status(task_id):
+    """Estado de una sincronización lanzada con lanzar_sincronizacion() o None si no existe"""
+    return cache.get(sync_status_cache_key(task_id))
+
+
+def get_ultima_sincronizacion():
+    """Resultado de la última sincronización exitosa (si no expiró) o None"""
+    return cache.get(SYNC_LAST_KEY)
+
+
+def sincronizacion_en_curso():
+    """Id de la tarea que tiene el lock o None si no hay una sincronización corriendo"""
+    return cache.get(SYNC_LOCK_KEY)
+
+
+def tomar_lock_sincronizacion():
+    """Toma el lock con un id de tarea nuevo y lo retorna, o None si ya hay una sincronización en curso"""
+    task_id = uuid.uuid4().hex
+    # cache.add es atómico: solo el primero en llegar toma el lock
+    if not cache.add(SYNC_LOCK_KEY, task_id, SYNC_LOCK_TIMEOUT):
+        return None
+    cache.set(sync_status_cache_key(task_id), {'state': 'PENDING', 'result': None}, SYNC_STATUS_TIMEOUT)
+    return task_id
+
+
+def lanzar_sincronizacion():
+    """
+    Ejecuta sync_external_products() en un proceso aparte (comando
+    sync_external_products) y retorna el id de la tarea.
+    El estado (PENDING / STARTED / SUCCESS / FAILURE) queda en la caché compartida,
+    así cualquier worker puede consultarlo y el proceso sobrevive al reciclado del worker.
+    Retorna None si ya hay una sincronización en curso.
+    """
+    task_id = tomar_lock_sincronizacion()
+    if task_id is None:
+        return None
+    try:
+        subprocess.Popen(
+            [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'sync_external_products', '--task-id', task_id],
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+    except Exception:
+        cache.delete(SYNC_LOCK_KEY)
+        cache.delete(sync_status_cache_key(task_id))
+        raise
+    return task_id
+
+
+def seguir_sincronizacion(task_id, intervalo=1):
+    """
+    Generador con los estados sucesivos de una sincronización: emite cada cambio
+    y termina con SUCCESS / FAILURE, si la tarea no existe o si pasa SYNC_LOCK_TIMEOUT
+    sin cambios (el mismo plazo en que expira el lock de una tarea que dejó de avanzar).
+    """
+    anterior = None
+    limite = time.monotonic() + SYNC_LOCK_TIMEOUT
+    while time.monotonic() < limite:
+        estado = get_sync_status(task_id)
+        if estado is None:
+            return
+        if estado != anterior:
+            yield estado
+            anterior = estado
+            # El progreso renueva el lock (ver ejecutar_sincronizacion): también el plazo
+            limite = time.monotonic() + SYNC_LOCK_TIMEOUT
+        if estado['state'] in SYNC_ESTADOS_FINALES:
+            return
+        time.sleep(intervalo)
+
+
+def ejecutar_sincronizacion(task_id):
+    """Corre la sincronización publicando su estado; libera el lock de task_id al terminar"""
+    key = sync_status_cache_key(task_id)
+    cache.set(key, {'state': 'STARTED', 'result': None}, SYNC_STATUS_TIMEOUT)
+
+    def publicar_progreso(contadores):
+        cache.set(key, {'state': 'PROGRESS', 'result': contadores}, SYNC_STATUS_TIMEOUT)
+        # Mientras avanza, renovar el lock: una sincronización larga no debe perderlo
+        if cache.get(SYNC_LOCK_KEY) == task_id:
+            cache.touch(SYNC_LOCK_KEY, SYNC_LOCK_TIMEOUT)
+
+    try:
+        resultado = sync_external_products(on_progress=publicar_progreso)
+        cache.set(key, {'state': 'SUCCESS', 'result': resultado}, SYNC_STATUS_TIMEOUT)
+        cache.set(SYNC_LAST_KEY, resultado, SYNC_LAST_TIMEOUT)
+    except Exception as e:
+        logger.exception("Error en sincronización en segundo plano: %s", e)
+        cache.set(key, {'state': 'FAILURE', 'result': {'error': str(e)}}, SYNC_STATUS_TIMEOUT)
+    finally:
+        # Solo liberar el lock propio: si expiró, puede tenerlo otra sincronización
+        if cache.get(SYNC_LOCK_KEY) == task_id:
+            cache.delete(SYNC_LOCK_KEY)
+    return cache.get(key)
@@ -86,6 +86,18 @@ class TestModels(TestCase):
         self.assertEqual(self.cart.total(), self.product.precio * self.cart_item.cantidad)
         self.assertEqual(self.cart.cantidad_items(), self.cart_item.cantidad)
 
+    def test_cart_resumen_single_query(self):
+        with self.assertNumQueries(1):
+            resumen = self.cart.resumen()
+        self.assertEqual(resumen['cantidad_items'], self.cart_item.cantidad)
+        self.assertEqual(resumen['total'], self.cart.total())
+
+        self.cart_item.cantidad += 1
+        self.cart_item.save()
+        self.assertEqual(self.cart.resumen()['cantidad_items'], self.cart_item.cantidad)
+        self.cart.limpiar()
+        self.assertEqual(self.cart.resumen()['cantidad_items'], 0)
+
     def test_cart_limpiar(self):
         self.cart.limpiar()
         self.assertEqual(self.cart.items.count(), 0)
@@ -95,13 +107,23 @@ class TestModels(TestCase):
         self.order.refresh_from_db()
         self.assertEqual(self.order.total, self.order_detail.subtotal)
 
+    def test_order_total_update_ignores_stale_prefetch(self):
+        order = Order.objects.prefetch_related('detalles').get(pk=self.order.pk)
+        OrderDetail.objects.create(pedido=self.order, producto=self.product, cantidad=1)
+        with self.assertNumQueries(2):
+            order.total_update()
+        esperado = sum(d.subtotal for d in OrderDetail.objects.filter(pedido=self.order))
+        self.assertEqual(order.total, esperado)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.total, esperado)
+
     def test_order_cancel_restock(self):
-        # Simula cancelar el pedido y verifica que el stock se restituye
-        stock_anterior = self.product.stock
+        # Simula cancelar el pedido y verifica que se devuelve el stock vendido
+        Product.objects.filter(pk=self.product.pk).update(stock_vendido=5)
         self.order.estado = 'cancelado'
         self.order.save()
         self.product.refresh_from_db()
-        self.assertEqual(self.product.stock, stock_anterior + self.order_detail.cantidad)
+        self.assertEqual(self.product.stock_vendido, 5 - self.order_detail.cantidad)
 
     def test_orderdetail_save_subtotal(self):
         self.order_detail.cantidad = 5
@@ -109,4 +131,34 @@ class TestModels(TestCase):
         self.assertEqual(self.order_detail.subtotal, self.product.precio * 5)
 
     def test_cartitem_subtotal(self):
-        self.assertEqual(self.cart_item.subtotal(), self.product.precio * self.cart_item.cantidad)
\ No newline at end of file
+        self.assertEqual(self.cart_item.subtotal(), self.product.precio * self.cart_item.cantidad)
+    def test_product_campos_calculados_match_properties(self):
+        oferta = Product.objects.create(
+            nombre=fake.word(),
+            descripcion=fake.text(),
+            precio=100,
+            stock_proveedor=3,
+            stock_vendido=5,
+            en_oferta=True,
+            precio_oferta_proveedor=40,
+            categoria=self.category
+        )
+        ilimitado = Product.objects.create(
+            nombre=fake.word(),
+            descripcion=fake.text(),
+            precio=50,
+            stock_ilimitado=True,
+            categoria=self.category
+        )
+        for producto in (oferta, ilimitado, self.product):
+            anotado = Product.objects.con_campos_calculados().get(pk=producto.pk)
+            self.assertEqual(anotado.stock_disponible, producto.stock_disponible)
+            self.assertEqual(anotado.precio_final, producto.precio_final)
+            self.assertEqual(anotado.disponible, producto.disponible)
+
+    def test_order_total_follows_details(self):
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.total, self.order_detail.subtotal)
+        self.order_detail.delete()
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.total, 0)
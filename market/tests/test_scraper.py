@@ -0,0 +1,49 @@
+from decimal import Decimal
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from market.models import Category, Product
+from market.scraper import process_products_batch
+from faker import Faker
+
+fake = Faker()
+
+def producto_json(external_id, precio):
+    return {
+        'idProductos': external_id,
+        'p_nombre': fake.word(),
+        'p_descripcion': fake.text(),
+        'stock': [{'s_cantidad': 5, 's_ilimitado': 0, 's_precio': precio}],
+    }
+
+class TestScraper(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(nombre='Relojes', descripcion=fake.text())
+
+    def test_process_products_batch_updates_existing_in_bulk(self):
+        existentes = [
+            Product.objects.create(
+                nombre=fake.word(), descripcion=fake.text(), precio=Decimal('1.00'),
+                categoria=self.category, external_id=str(external_id)
+            )
+            for external_id in (1, 2, 3)
+        ]
+        manual = existentes[2]
+        manual.precio_manual = True
+        manual.save()
+
+        lote = [producto_json(1, 10), producto_json(2, 20), producto_json(3, 30), producto_json(4, 40)]
+        with CaptureQueriesContext(connection) as ctx:
+            procesados, nuevos, actualizados, errores = process_products_batch(lote, self.category)
+
+        self.assertEqual(sorted(procesados), ['1', '2', '3', '4'])
+        self.assertEqual((nuevos, actualizados, errores), (1, 3, 0))
+        updates = [q for q in ctx.captured_queries if q['sql'].startswith('UPDATE "market_product"')]
+        self.assertEqual(len(updates), 1)
+        lectura = next(q['sql'] for q in ctx.captured_queries if q['sql'].startswith('SELECT'))
+        self.assertNotIn('descripcion', lectura)
+
+        self.assertEqual(Product.objects.get(external_id='1').precio, Decimal('20.00'))
+        self.assertEqual(Product.objects.get(external_id='3').precio, Decimal('1.00'))
+        self.assertEqual(Product.objects.get(external_id='4').precio, Decimal('80.00'))
+        self.assertEqual(Product.objects.get(external_id='2').stock_proveedor, 5)
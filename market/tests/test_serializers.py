@@ -2,6 +2,8 @@ from django.test import TestCase
 from market.models import *
 from market.serializer import *
 from account_admin.models import User
+from django.db.models import FloatField
+from django.db.models.functions import Cast
 from faker import Faker
 from rest_framework.exceptions import ValidationError
 from rest_framework.request import Request
@@ -84,31 +86,37 @@ class TestSerializers(TestCase):
         order = serializer.save()
         self.assertEqual(order.usuario, self.user)
 
-    def test_order_serializer_get_detalles(self):
+    def test_order_serializer_detalles(self):
         serializer = OrderSerializer(instance=self.order)
-        detalles = serializer.get_detalles(self.order)
+        detalles = serializer.data['detalles']
         self.assertIsInstance(detalles, list)
+        self.assertEqual([d['id'] for d in detalles], [self.order_detail.id])
 
     def test_orderdetail_serializer(self):
         serializer = OrderDetailSerializer(instance=self.order_detail)
         data = serializer.data
         self.assertEqual(data['producto_detalle']['id'], self.product.id)
 
-    def test_pay_serializer_get_pedido_detalle_and_create(self):
+    def test_pay_serializer_pedido_detalle_and_create(self):
         serializer = PaySerializer(instance=self.pay)
-        detalle = serializer.get_pedido_detalle(self.pay)
+        detalle = serializer.data['pedido_detalle']
         self.assertEqual(detalle['id'], self.order.id)
+        self.assertIsInstance(detalle['total'], float)
         # Test create
         pay_data = {'pedido': self.order.id, 'metodo': 'tarjeta', 'estado': 'completado'}
         serializer = PaySerializer(data=pay_data)
         self.assertTrue(serializer.is_valid(), serializer.errors)
         pay = serializer.save()
+        self.order.refresh_from_db()
         self.assertEqual(pay.monto_pagado, self.order.total)
 
-    def test_shipment_serializer_get_pedido_detalle_and_validate(self):
+    def test_shipment_serializer_pedido_detalle_and_validate(self):
         serializer = ShipmentSerializer(instance=self.shipment)
-        detalle = serializer.get_pedido_detalle(self.shipment)
+        detalle = serializer.data['pedido_detalle']
         self.assertEqual(detalle['id'], self.order.id)
+        self.assertEqual(detalle['cliente'], self.order.usuario.username)
+        self.assertEqual(detalle['total_productos'], self.order.detalles.count())
+        self.assertLessEqual(len(detalle['productos']), 5)
 
         # Test validate (estado inválido)
         self.order.estado = 'pagado'  # Estado inválido para Shipment
@@ -153,23 +161,6 @@ class TestSerializers(TestCase):
         self.assertEqual(float(data['total']), float(self.cart.total()))
         self.assertEqual(data['cantidad_items'], self.cart.cantidad_items())
 
-    def test_order_serializer_get_detalles_no_attrs(self):
-        class DummyObj:
-            pass
-        # Cubre líneas 70-73 (ni detalles ni orderdetail_set)
-        serializer = OrderSerializer()
-        dummy = DummyObj()
-        detalles = serializer.get_detalles(dummy)
-        self.assertEqual(detalles, [])
-
-    def test_order_serializer_get_detalles_exception(self):
-        # Cubre líneas 78-80 y 137-139 (excepción en el try)
-        class BadObj:
-            detalles = property(lambda self: 1/0)  # Provoca excepción
-        serializer = OrderSerializer()
-        detalles = serializer.get_detalles(BadObj())
-        self.assertEqual(detalles, [])
-
     def test_order_serializer_to_representation_edit(self):
         # Cubre líneas 91-111 (rama de edición)
         factory = APIRequestFactory()
@@ -189,40 +180,69 @@ class TestSerializers(TestCase):
         order = serializer.save()
         self.assertEqual(order.usuario, self.user)
 
-    def test_order_serializer_get_detalles_orderdetail_set(self):
-        class DummyObj:
-            def __init__(self, detalles):
-                self.orderdetail_set = detalles
-        detalles_qs = OrderDetail.objects.none()  # Un queryset vacío, simula el all()
-        dummy = DummyObj(detalles_qs)
-        serializer = OrderSerializer()
-        detalles = serializer.get_detalles(dummy)
-        self.assertEqual(detalles, [])
-
-    def test_order_serializer_create_with_missing_producto(self):
-        order_data = {
-            'usuario': self.user.username,
-            'detalles': [
-                {'cantidad': 2},  # Falta 'producto', debería activar el continue
-                {'producto': self.product.id, 'cantidad': 1}
-            ]
-        }
-        serializer = OrderSerializer(data=order_data)
-        self.assertTrue(serializer.is_valid(), serializer.errors)
-        order = serializer.save()
-        # Solo debe haberse creado un detalle (el que sí tiene producto)
-        self.assertEqual(order.detalles.count(), 1)
-
-    def test_order_serializer_create_with_nonexistent_producto(self):
-        order_data = {
-            'usuario': self.user.username,
-            'detalles': [
-                {'producto': 999999, 'cantidad': 1},  # ID que no existe
-                {'producto': self.product.id, 'cantidad': 2}
-            ]
-        }
-        serializer = OrderSerializer(data=order_data)
-        self.assertTrue(serializer.is_valid(), serializer.errors)
-        order = serializer.save()
-        # Solo debe haberse creado el detalle con producto existente
-        self.assertEqual(order.detalles.count(), 1)
\ No newline at end of file
+    def test_order_item_input_serializer_missing_producto(self):
+        items = [
+            {'cantidad': 2},  # Falta 'producto'
+            {'producto': self.product.id, 'cantidad': 1}
+        ]
+        serializer = OrderItemInputSerializer(data=items, many=True)
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('producto', serializer.errors[0])
+        self.assertEqual(serializer.errors[1], {})
+
+    def test_cached_fields_are_per_instance_copies(self):
+        primero = ProductSerializer(instance=self.product)
+        segundo = ProductSerializer(instance=self.product)
+        self.assertEqual(list(primero.fields), list(segundo.fields))
+        self.assertIsNot(primero.fields['categoria'], segundo.fields['categoria'])
+        self.assertIs(segundo.fields['categoria'].parent, segundo)
+        self.assertEqual(segundo.data['categoria']['id'], self.category.id)
+
+    def test_pay_serializer_rejects_second_open_pay(self):
+        Pay.objects.create(pedido=self.order, metodo='transferencia', estado='pendiente')
+        serializer = PaySerializer(data={'pedido': self.order.id, 'metodo': 'tarjeta'})
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('Ya existe un pago abierto', str(serializer.errors))
+
+    def test_product_serializer_imagen_url_without_file(self):
+        data = ProductSerializer(instance=self.product).data
+        self.assertIsNone(data['imagen_url'])
+
+    def test_order_edit_serializer_simplified(self):
+        data = OrderEditSerializer(instance=self.order).data
+        self.assertEqual(data['usuario_detalle'], {'username': self.user.username})
+        self.assertNotIn('fecha', data)
+        self.assertNotIn('total', data)
+        self.assertEqual(data['detalles'], [{
+            'id': self.order_detail.id,
+            'producto': self.product.id,
+            'cantidad': self.order_detail.cantidad
+        }])
+
+    def test_pay_serializer_rejects_card_data_in_metadata(self):
+        order = Order.objects.create(usuario=self.user, estado='pendiente')
+        serializer = PaySerializer(data={
+            'pedido': order.id,
+            'metodo': 'tarjeta',
+            'metadata': {'cvv': '123', 'titular': 'x'}
+        })
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('datos sensibles de tarjeta', str(serializer.errors))
+
+    def test_product_serializer_cache_follows_product_changes(self):
+        request = Request(APIRequestFactory().get('/fake-url/'))
+        data = ProductSerializer(instance=self.product, context={'request': request}).data
+        self.assertEqual(data['nombre'], self.product.nombre)
+
+        self.product.nombre = 'nombre-actualizado'
+        self.product.save()
+        data = ProductSerializer(instance=self.product, context={'request': request}).data
+        self.assertEqual(data['nombre'], 'nombre-actualizado')
+
+    def test_pedido_brief_uses_annotated_float_total(self):
+        pedido = Order.objects.annotate(_total_float=Cast('total', FloatField())).get(pk=self.order.pk)
+        data = PedidoBriefSerializer(instance=pedido).data
+        self.assertEqual(data['total'], pedido._total_float)
+        # La señal de OrderDetail actualizó el total en la base, no en self.order
+        self.order.refresh_from_db()
+        self.assertEqual(data['total'], float(self.order.total))
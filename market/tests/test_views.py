@@ -4,7 +4,15 @@ from rest_framework import status
 from market.models import *
 from account_admin.models import User
 from faker import Faker
-from unittest.mock import put
+from unittest.mock import patch
+from io import StringIO
+from django.core.management import call_command
+import json
+from decimal import Decimal
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.core.paginator import UnorderedObjectListWarning
+import warnings
 
 fake = Faker()
 
@@ -12,24 +20,27 @@ class TestViews(APITestCase):
     def setUp(self):
         self.user = User.objects.create_user(
             username=fake.unique.user_name(),
-            name=fake.unique.name(),
+            first_name=fake.first_name(),
             email=fake.unique.email(),
             password='testpass123',
             role='admin'
         )
         self.client = APIClient()
         self.client.force_authenticate(user=self.user)
-        self.category = Category.objects.create(
-            nombre=fake.word(),
-            descripcion=fake.text()
-        )
-        self.product = Product.objects.create(
-            nombre=fake.word(),
-            descripcion=fake.text(),
-            precio=fake.pydecimal(left_digits=4, right_digits=2, positive=True),
-            stock=10,
-            categoria=self.category
-        )
+        # Ejecuta los on_commit del catálogo como si el fixture se hubiera confirmado
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category = Category.objects.create(
+                nombre=fake.word(),
+                descripcion=fake.text()
+            )
+            self.product = Product.objects.create(
+                nombre=fake.word(),
+                descripcion=fake.text(),
+                precio=fake.pydecimal(left_digits=4, right_digits=2, positive=True),
+                stock=10,
+                stock_proveedor=10,
+                categoria=self.category
+            )
         self.cart = Cart.objects.create(usuario=self.user)
         self.order = Order.objects.create(usuario=self.user, estado='pendiente')
         self.order_detail = OrderDetail.objects.create(
@@ -232,14 +243,14 @@ class TestViews(APITestCase):
         # Crea un usuario cliente y una orden de otro usuario
         client_user = User.objects.create_user(
             username=fake.unique.user_name(),
-            name=fake.unique.name(),
+            first_name=fake.first_name(),
             email=fake.email(),
             password='testpass123',
             role='client'
         )
         other_user = User.objects.create_user(
             username=fake.unique.user_name(),
-            name=fake.name(),
+            first_name=fake.first_name(),
             email=fake.email(),
             password='testpass123',
             role='client'
@@ -288,11 +299,11 @@ class TestViews(APITestCase):
             estado='pendiente'
         )
         url = reverse('order-detail', kwargs={'pk': order.id})
-        data = {'estado': 'procesando', 'usuario': self.user.username}
+        data = {'estado': 'preparando', 'usuario': self.user.username}
         response = self.client.put(url, data, format='json')
         self.assertEqual(response.status_code, 200)
         order.refresh_from_db()
-        self.assertEqual(order.estado, 'procesando')
+        self.assertEqual(order.estado, 'preparando')
 
     def test_order_update_with_detalles(self):
         # Crea un producto nuevo para agregar como detalle
@@ -382,7 +393,48 @@ class TestViews(APITestCase):
         self.assertEqual(detail.cantidad, 5)
         # Stock original 10 + 2 (devuelto) - 5 (nuevo) = 7
         self.assertEqual(product.stock, 7)
-    
+
+    def test_order_update_details_recalcula_total_una_vez(self):
+        # Editar varios detalles no dispara la señal por fila: un solo SUM del total
+        order = Order.objects.create(usuario=self.user, estado='pendiente')
+        detalles = []
+        for _ in range(3):
+            product = Product.objects.create(
+                nombre=fake.word(), descripcion=fake.text(), precio=10, stock=10, categoria=self.category
+            )
+            detail = OrderDetail.objects.create(pedido=order, producto=product, cantidad=1, subtotal=10)
+            detalles.append({"id": detail.id, "producto": product.id, "cantidad": 2})
+        url = reverse('order-detail', kwargs={'pk': order.id})
+        data = {"estado": "pendiente", "usuario": self.user.username, "detalles": detalles}
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.put(url, data, format='json')
+        self.assertEqual(response.status_code, 200)
+        sumas = [q for q in ctx.captured_queries if 'SUM(' in q['sql'] and 'market_orderdetail' in q['sql']]
+        self.assertEqual(len(sumas), 1)
+        order.refresh_from_db()
+        self.assertEqual(order.total, 60)
+
+    def _queries_editando_detalles(self, n):
+        order = Order.objects.create(usuario=self.user, estado='pendiente')
+        detalles = []
+        for _ in range(n):
+            product = Product.objects.create(
+                nombre=fake.word(), descripcion=fake.text(), precio=10, stock=10, categoria=self.category
+            )
+            detail = OrderDetail.objects.create(pedido=order, producto=product, cantidad=1, subtotal=10)
+            detalles.append({"id": detail.id, "producto": product.id, "cantidad": 3})
+        url = reverse('order-detail', kwargs={'pk': order.id})
+        data = {"estado": "pendiente", "usuario": self.user.username, "detalles": detalles}
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.put(url, data, format='json')
+        self.assertEqual(response.status_code, 200)
+        # 10 + 1 (devuelto) - 3 (nuevo) = 8 en cada producto
+        self.assertEqual(Product.objects.filter(orderdetail__pedido=order, stock=8).count(), n)
+        return len(ctx.captured_queries)
+
+    def test_order_update_details_queries_constantes(self):
+        self.assertEqual(self._queries_editando_detalles(1), self._queries_editando_detalles(5))
+
     def test_order_update_detail_quantity_stock_insufficient(self):
         # Crea un producto con poco stock
         product = Product.objects.create(
@@ -581,7 +633,7 @@ class TestViews(APITestCase):
         # Crea un carrito de otro usuario
         other_user = User.objects.create_user(
             username=fake.unique.user_name(),
-            name=fake.unique.name(),
+            first_name=fake.first_name(),
             email=fake.unique.email(),
             password='testpass123',
             role='client'
@@ -601,7 +653,7 @@ class TestViews(APITestCase):
 
     def test_cart_checkout_insufficient_stock_first_check(self):
         # Agrega un producto al carrito con cantidad mayor al stock
-        self.product.stock = 2
+        self.product.stock_proveedor = 2
         self.product.save()
         CartItem.objects.create(carrito=self.cart, producto=self.product, cantidad=5)
         url = reverse('cart-checkout')
@@ -615,48 +667,36 @@ class TestViews(APITestCase):
             nombre=fake.word(),
             descripcion=fake.text(),
             precio=10,
-            stock=5,
+            stock_proveedor=5,
             categoria=self.category
         )
         product2 = Product.objects.create(
             nombre=fake.word(),
             descripcion=fake.text(),
             precio=10,
-            stock=5,
+            stock_proveedor=5,
             categoria=self.category
         )
         CartItem.objects.create(carrito=self.cart, producto=product1, cantidad=5)
         CartItem.objects.create(carrito=self.cart, producto=product2, cantidad=5)
 
-        # Mock del método refresh_from_db para simular la concurrencia
-        original_refresh = Product.refresh_from_db
-        refresh_call_count = 0
-        
-        def mock_refresh(self):
-            nonlocal refresh_call_count
-            refresh_call_count += 1
-            original_refresh(self)
-            # En la segunda llamada (product2), simular que otro proceso redujo el stock
-            if refresh_call_count == 2 and self.id == product2.id:
-                Product.objects.filter(id=product2.id).update(stock=2)
-                # Refrescar nuevamente para obtener el valor actualizado
-                original_refresh(self)
-        
-        # Aplicar el mock
-        Product.refresh_from_db = mock_refresh
-        
-        try:
-            url = reverse('cart-checkout')
-            response = self.client.post(url)
-            self.assertEqual(response.status_code, 400)
-            self.assertIn('Stock insuficiente', str(response.data))
-        finally:
-            # Restaurar el método original
-            Product.refresh_from_db = original_refresh
+        # Otro proceso vende parte del stock de product2 después de cargar el carrito:
+        # el chequeo se hace sobre las filas bloqueadas, sin refresh_from_db por ítem
+        Product.objects.filter(id=product2.id).update(stock_vendido=3)
+        pedidos_antes = Order.objects.count()
+
+        url = reverse('cart-checkout')
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Stock insuficiente', str(response.data))
+        # No se crea el pedido ni se toca el stock del otro producto
+        self.assertEqual(Order.objects.count(), pedidos_antes)
+        product1.refresh_from_db()
+        self.assertEqual(product1.stock_vendido, 0)
     
     def test_cart_checkout_success(self):
         # Agrega un producto al carrito con cantidad igual al stock
-        self.product.stock = 5
+        self.product.stock_proveedor = 5
         self.product.save()
         CartItem.objects.create(carrito=self.cart, producto=self.product, cantidad=5)
         url = reverse('cart-checkout')
@@ -667,7 +707,7 @@ class TestViews(APITestCase):
         self.assertEqual(self.cart.items.count(), 0)
         # El stock debe haberse descontado
         self.product.refresh_from_db()
-        self.assertEqual(self.product.stock, 0)
+        self.assertEqual(self.product.stock_disponible, 0)
 
     def test_pay_filter_by_estado(self):
         """Test para filtrar pagos por estado"""
@@ -709,7 +749,7 @@ class TestViews(APITestCase):
         # Cambiar el usuario actual a un cliente (no admin)
         client_user = User.objects.create_user(
             username=fake.unique.user_name(),
-            name=fake.unique.name(),
+            first_name=fake.first_name(),
             email=fake.unique.email(),
             password='testpass123',
             role='client'
@@ -719,7 +759,7 @@ class TestViews(APITestCase):
         # Crear otro usuario cliente
         other_user = User.objects.create_user(
             username=fake.unique.user_name(),
-            name=fake.unique.name(),
+            first_name=fake.first_name(),
             email=fake.unique.email(),
             password='testpass123',
             role='client'
@@ -758,7 +798,7 @@ class TestViews(APITestCase):
         # Crear un usuario cliente
         client_user = User.objects.create_user(
             username=fake.unique.user_name(),
-            name=fake.unique.name(),
+            first_name=fake.first_name(),
             email=fake.unique.email(),
             password='testpass123',
             role='client'
@@ -777,7 +817,7 @@ class TestViews(APITestCase):
         }
         response = self.client.post(url, data)
         self.assertEqual(response.status_code, 400)
-        self.assertIn('No puedes crear pagos para pedidos que no te pertenecen', str(response.data))
+        self.assertIn('No puedes crear pagos para pedidos ajenos', str(response.data))
     
     def test_pay_create_invalid_order_state(self):
         """Test que verifica que no se puede pagar una orden en estado inválido"""
@@ -831,7 +871,7 @@ class TestViews(APITestCase):
     
     def test_pay_create_success_with_custom_estado(self):
         """Test para verificar creación exitosa con estado personalizado"""
-        order = Order.objects.create(usuario=self.user, estado='procesando', total=200)
+        order = Order.objects.create(usuario=self.user, estado='pendiente', total=200)
         url = reverse('pay-list')
         data = {
             'pedido': order.id,
@@ -852,7 +892,7 @@ class TestViews(APITestCase):
         # Crear otro usuario
         other_user = User.objects.create_user(
             username=fake.unique.user_name(),
-            name=fake.unique.name(),
+            first_name=fake.first_name(),
             email=fake.unique.email(),
             password='testpass123',
             role='client'
@@ -881,7 +921,7 @@ class TestViews(APITestCase):
         order = Order.objects.create(usuario=self.user, estado='pendiente', total=100)
         
         # Mock del queryset select_for_update
-        with put('market.views.Order.objects.select_for_update') as mock_select:
+        with patch('market.views.Order.objects.select_for_update') as mock_select:
             mock_manager = mock_select.return_value
             mock_manager.get.side_effect = Order.DoesNotExist("Pedido no encontrado")
             
@@ -906,13 +946,12 @@ class TestViews(APITestCase):
             estado='pendiente'
         )
         
-        url = reverse('pay-complete-payment', kwargs={'pk': payment.id})
+        url = reverse('pay-complete', kwargs={'pk': payment.id})
         response = self.client.post(url)
         
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.data['status'], 'pago completado')
-        self.assertEqual(response.data['pedido_actualizado'], True)
-        self.assertEqual(response.data['nuevo_estado_pedido'], 'pagado')
+        self.assertEqual(response.data['estado'], 'completado')
+        self.assertEqual(response.data['pedido_detalle']['estado'], 'pagado')
         
         # Verificar que el pago se actualizó
         payment.refresh_from_db()
@@ -927,7 +966,7 @@ class TestViews(APITestCase):
         # Crear usuario cliente
         client_user = User.objects.create_user(
             username=fake.unique.user_name(),
-            name=fake.unique.name(),
+            first_name=fake.first_name(),
             email=fake.unique.email(),
             password='testpass123',
             role='client'
@@ -943,11 +982,11 @@ class TestViews(APITestCase):
             estado='pendiente'
         )
         
-        url = reverse('pay-complete-payment', kwargs={'pk': payment.id})
+        url = reverse('pay-complete', kwargs={'pk': payment.id})
         response = self.client.post(url)
         
         self.assertEqual(response.status_code, 403)
-        self.assertIn('Solo administradores y operadores pueden completar pagos manualmente', str(response.data))
+        self.assertIn('No autorizado', str(response.data))
     
     def test_pay_complete_payment_invalid_state(self):
         """Test que verifica que no se puede completar un pago que no está pendiente"""
@@ -960,35 +999,35 @@ class TestViews(APITestCase):
             estado='completado'  # Ya está completado
         )
         
-        url = reverse('pay-complete-payment', kwargs={'pk': payment.id})
+        url = reverse('pay-complete', kwargs={'pk': payment.id})
         response = self.client.post(url)
         
         self.assertEqual(response.status_code, 400)
-        self.assertIn('No se puede completar un pago en estado completado', str(response.data))
+        self.assertIn('Solo se puede completar un pago pendiente o en revisión', str(response.data))
     
-    def test_pay_complete_payment_cancelled_state(self):
-        """Test que verifica que no se puede completar un pago cancelado"""
-        # Crear orden y pago cancelado
+    def test_pay_complete_payment_failed_state(self):
+        """Test que verifica que no se puede completar un pago fallido"""
+        # Crear orden y pago fallido
         order = Order.objects.create(usuario=self.user, estado='pendiente', total=100)
         payment = Pay.objects.create(
             pedido=order,
             metodo='tarjeta',
             monto_pagado=100,
-            estado='cancelado'
+            estado='fallido'
         )
         
-        url = reverse('pay-complete-payment', kwargs={'pk': payment.id})
+        url = reverse('pay-complete', kwargs={'pk': payment.id})
         response = self.client.post(url)
         
         self.assertEqual(response.status_code, 400)
-        self.assertIn('No se puede completar un pago en estado cancelado', str(response.data))
+        self.assertIn('Solo se puede completar un pago pendiente o en revisión', str(response.data))
     
     def test_pay_complete_payment_operator_can_complete(self):
         """Test que verifica que los operadores también pueden completar pagos"""
         # Crear usuario operador
         operator_user = User.objects.create_user(
             username=fake.unique.user_name(),
-            name=fake.unique.name(),
+            first_name=fake.first_name(),
             email=fake.unique.email(),
             password='testpass123',
             role='operator'
@@ -1004,11 +1043,11 @@ class TestViews(APITestCase):
             estado='pendiente'
         )
         
-        url = reverse('pay-complete-payment', kwargs={'pk': payment.id})
+        url = reverse('pay-complete', kwargs={'pk': payment.id})
         response = self.client.post(url)
         
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.data['status'], 'pago completado')
+        self.assertEqual(response.data['estado'], 'completado')
         
         # Verificar cambios
         payment.refresh_from_db()
@@ -1016,8 +1055,8 @@ class TestViews(APITestCase):
         self.assertEqual(payment.estado, 'completado')
         self.assertEqual(order.estado, 'pagado')
 
-    def test_pay_cancelar_success(self):
-        """Test para cancelar un pago pendiente exitosamente"""
+    def test_pay_fail_success(self):
+        """Test para marcar como fallido un pago pendiente"""
         # Crear orden y pago pendiente
         order = Order.objects.create(usuario=self.user, estado='pendiente', total=100)
         payment = Pay.objects.create(
@@ -1027,18 +1066,18 @@ class TestViews(APITestCase):
             estado='pendiente'
         )
         
-        url = reverse('pay-cancelar', kwargs={'pk': payment.id})
+        url = reverse('pay-fail', kwargs={'pk': payment.id})
         response = self.client.post(url)
         
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.data['mensaje'], 'Pago cancelado correctamente')
+        self.assertEqual(response.data['estado'], 'fallido')
         
         # Verificar que el pago se actualizó
         payment.refresh_from_db()
-        self.assertEqual(payment.estado, 'cancelado')
+        self.assertEqual(payment.estado, 'fallido')
     
-    def test_pay_cancelar_already_completed(self):
-        """Test que verifica que no se puede cancelar un pago completado"""
+    def test_pay_fail_already_completed(self):
+        """Test que verifica que no se puede fallar un pago completado"""
         # Crear orden y pago completado
         order = Order.objects.create(usuario=self.user, estado='pendiente', total=100)
         payment = Pay.objects.create(
@@ -1048,43 +1087,43 @@ class TestViews(APITestCase):
             estado='completado'
         )
         
-        url = reverse('pay-cancelar', kwargs={'pk': payment.id})
+        url = reverse('pay-fail', kwargs={'pk': payment.id})
         response = self.client.post(url)
         
         self.assertEqual(response.status_code, 400)
-        self.assertIn('No se puede cancelar un pago en estado \'completado\'', str(response.data))
+        self.assertIn('Solo se puede fallar un pago pendiente o en revisión', str(response.data))
         
         # Verificar que el pago NO se cambió
         payment.refresh_from_db()
         self.assertEqual(payment.estado, 'completado')
     
-    def test_pay_cancelar_already_cancelled(self):
-        """Test que verifica que no se puede cancelar un pago ya cancelado"""
-        # Crear orden y pago ya cancelado
+    def test_pay_fail_already_failed(self):
+        """Test que verifica que no se puede fallar un pago ya fallido"""
+        # Crear orden y pago ya fallido
         order = Order.objects.create(usuario=self.user, estado='pendiente', total=100)
         payment = Pay.objects.create(
             pedido=order,
             metodo='tarjeta',
             monto_pagado=100,
-            estado='cancelado'
+            estado='fallido'
         )
         
-        url = reverse('pay-cancelar', kwargs={'pk': payment.id})
+        url = reverse('pay-fail', kwargs={'pk': payment.id})
         response = self.client.post(url)
         
         self.assertEqual(response.status_code, 400)
-        self.assertIn('No se puede cancelar un pago en estado \'cancelado\'', str(response.data))
+        self.assertIn('Solo se puede fallar un pago pendiente o en revisión', str(response.data))
         
         # Verificar que el estado se mantiene
         payment.refresh_from_db()
-        self.assertEqual(payment.estado, 'cancelado')
+        self.assertEqual(payment.estado, 'fallido')
     
-    def test_pay_cancelar_client_can_cancel_own_payment(self):
-        """Test que verifica que los clientes pueden cancelar sus propios pagos"""
+    def test_pay_fail_client_can_fail_own_payment(self):
+        """Test que verifica que los clientes pueden fallar sus propios pagos"""
         # Crear usuario cliente
         client_user = User.objects.create_user(
             username=fake.unique.user_name(),
-            name=fake.unique.name(),
+            first_name=fake.first_name(),
             email=fake.unique.email(),
             password='testpass123',
             role='client'
@@ -1100,22 +1139,22 @@ class TestViews(APITestCase):
             estado='pendiente'
         )
         
-        url = reverse('pay-cancelar', kwargs={'pk': payment.id})
+        url = reverse('pay-fail', kwargs={'pk': payment.id})
         response = self.client.post(url)
         
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.data['mensaje'], 'Pago cancelado correctamente')
+        self.assertEqual(response.data['estado'], 'fallido')
         
-        # Verificar que el pago se canceló
+        # Verificar que el pago quedó fallido
         payment.refresh_from_db()
-        self.assertEqual(payment.estado, 'cancelado')
+        self.assertEqual(payment.estado, 'fallido')
     
-    def test_pay_cancelar_operator_can_cancel(self):
-        """Test que verifica que los operadores pueden cancelar pagos"""
+    def test_pay_fail_operator_can_fail(self):
+        """Test que verifica que los operadores pueden fallar pagos"""
         # Crear usuario operador
         operator_user = User.objects.create_user(
             username=fake.unique.user_name(),
-            name=fake.unique.name(),
+            first_name=fake.first_name(),
             email=fake.unique.email(),
             password='testpass123',
             role='operator'
@@ -1131,22 +1170,22 @@ class TestViews(APITestCase):
             estado='pendiente'
         )
         
-        url = reverse('pay-cancelar', kwargs={'pk': payment.id})
+        url = reverse('pay-fail', kwargs={'pk': payment.id})
         response = self.client.post(url)
         
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.data['mensaje'], 'Pago cancelado correctamente')
+        self.assertEqual(response.data['estado'], 'fallido')
         
-        # Verificar que el pago se canceló
+        # Verificar que el pago quedó fallido
         payment.refresh_from_db()
-        self.assertEqual(payment.estado, 'cancelado')
+        self.assertEqual(payment.estado, 'fallido')
     
     def test_shipment_list_client_sees_only_own(self):
         """Test que verifica que los clientes solo ven envíos de sus propias órdenes"""
         # Crear usuario cliente
         client_user = User.objects.create_user(
             username=fake.unique.user_name(),
-            name=fake.unique.name(),
+            first_name=fake.first_name(),
             email=fake.unique.email(),
             password='testpass123',
             role='client'
@@ -1200,7 +1239,7 @@ class TestViews(APITestCase):
         # Crear usuario cliente
         client_user = User.objects.create_user(
             username=fake.unique.user_name(),
-            name=fake.unique.name(),
+            first_name=fake.first_name(),
             email=fake.unique.email(),
             password='testpass123',
             role='client'
@@ -1358,7 +1397,7 @@ class TestViews(APITestCase):
         # Crear usuario operador
         operator_user = User.objects.create_user(
             username=fake.unique.user_name(),
-            name=fake.unique.name(),
+            first_name=fake.first_name(),
             email=fake.unique.email(),
             password='testpass123',
             role='operator'
@@ -1385,4 +1424,587 @@ class TestViews(APITestCase):
         
         # Verificar que el envío se actualizó
         shipment.refresh_from_db()
-        self.assertEqual(shipment.estado, 'preparando')
\ No newline at end of file
+        self.assertEqual(shipment.estado, 'preparando')
+
+    def test_shipment_list_query_count_constant(self):
+        """El listado de envíos no debe crecer en consultas con la cantidad de envíos (N+1)"""
+        url = reverse('shipment-list')
+        with CaptureQueriesContext(connection) as base:
+            self.client.get(url)
+
+        for _ in range(3):
+            order = Order.objects.create(usuario=self.user, estado='pendiente', total=100)
+            OrderDetail.objects.create(pedido=order, producto=self.product, cantidad=1)
+            Shipment.objects.create(
+                pedido=order,
+                direccion_envio=fake.address(),
+                empresa_envio=fake.company(),
+                numero_guia=fake.uuid4(),
+                estado='pendiente'
+            )
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 4)
+        self.assertEqual(len(ctx.captured_queries), len(base.captured_queries))
+
+    def test_product_export_streams_all_products(self):
+        url = reverse('product-export')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(len(data), Product.objects.count())
+        self.assertEqual(data[0]['id'], self.product.id)
+
+    def test_order_export_only_own_orders_for_client(self):
+        client_user = User.objects.create_user(
+            username=fake.unique.user_name(),
+            email=fake.unique.email(),
+            password='testpass123',
+            role='client'
+        )
+        own_order = Order.objects.create(usuario=client_user, estado='pendiente')
+        self.client.force_authenticate(user=client_user)
+        response = self.client.get(reverse('order-export'))
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual([o['id'] for o in data], [own_order.id])
+
+    def test_order_add_items_bulk(self):
+        product2 = Product.objects.create(
+            nombre=fake.word(),
+            descripcion=fake.text(),
+            precio=10,
+            stock_proveedor=5,
+            categoria=self.category
+        )
+        self.product.stock_proveedor = 5
+        self.product.save()
+        url = reverse('order-add-items', kwargs={'pk': self.order.id})
+        response = self.client.post(url, {'detalles_input': [
+            {'producto': self.product.id, 'cantidad': 1},
+            {'producto': product2.id, 'cantidad': 3},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.order.detalles.count(), 3)
+        product2.refresh_from_db()
+        self.assertEqual(product2.stock_vendido, 3)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.total, sum(d.subtotal for d in self.order.detalles.all()))
+
+    def test_order_add_items_insufficient_stock_rolls_back(self):
+        url = reverse('order-add-items', kwargs={'pk': self.order.id})
+        response = self.client.post(url, {'detalles_input': [
+            {'producto': self.product.id, 'cantidad': 1000},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.order.detalles.count(), 1)
+
+    def test_product_list_includes_categoria_and_constant_queries(self):
+        url = reverse('product-list')
+        with CaptureQueriesContext(connection) as base:
+            response = self.client.get(url)
+        self.assertEqual(response.data[0]['categoria'], {'id': self.category.id, 'nombre': self.category.nombre})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            otra = Category.objects.create(nombre=fake.unique.word(), descripcion=fake.text())
+            for _ in range(3):
+                Product.objects.create(nombre=fake.word(), descripcion=fake.text(), precio=10, categoria=otra)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(ctx.captured_queries), len(base.captured_queries))
+
+    def test_order_list_query_count_constant(self):
+        url = reverse('order-list')
+        with CaptureQueriesContext(connection) as base:
+            self.client.get(url)
+
+        for _ in range(3):
+            order = Order.objects.create(usuario=self.user, estado='pendiente')
+            OrderDetail.objects.create(pedido=order, producto=self.product, cantidad=1)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(ctx.captured_queries), len(base.captured_queries))
+
+    def test_order_list_returns_detail_ids(self):
+        response = self.client.get(reverse('order-list'))
+        self.assertEqual(response.status_code, 200)
+        order = next(o for o in response.data if o['id'] == self.order.id)
+        self.assertEqual(order['detalles'], [self.order_detail.id])
+
+        response = self.client.get(reverse('order-detail', kwargs={'pk': self.order.id}))
+        self.assertEqual(response.data['detalles'][0]['producto_detalle']['id'], self.product.id)
+
+    def test_bulk_update_markup_single_update(self):
+        staff_user = User.objects.create_user(
+            username=fake.unique.user_name(),
+            email=fake.unique.email(),
+            password='testpass123',
+            role='admin',
+            is_staff=True
+        )
+        self.client.force_authenticate(user=staff_user)
+        self.product.precio_proveedor = Decimal('100.00')
+        self.product.save()
+        manual = Product.objects.create(
+            nombre=fake.word(), precio=Decimal('50.00'), precio_proveedor=Decimal('10.00'),
+            precio_manual=True, categoria=self.category
+        )
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse('bulk-update-markup'), {'markup_percentage': 50}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['productos_actualizados'], 1)
+        self.assertEqual(len([q for q in ctx.captured_queries if q['sql'].startswith('UPDATE "market_product"')]), 1)
+
+        self.product.refresh_from_db()
+        manual.refresh_from_db()
+        self.assertEqual(self.product.precio, Decimal('150.00'))
+        self.assertEqual(manual.precio, Decimal('50.00'))
+
+    def test_bulk_update_markup_idempotency_key_replay(self):
+        staff_user = User.objects.create_user(
+            username=fake.unique.user_name(), email=fake.unique.email(),
+            password='testpass123', role='admin', is_staff=True
+        )
+        self.client.force_authenticate(user=staff_user)
+        self.product.precio_proveedor = Decimal('100.00')
+        self.product.save()
+        url = reverse('bulk-update-markup')
+
+        response = self.client.post(url, {'markup_percentage': 50}, format='json', HTTP_IDEMPOTENCY_KEY='k-1')
+        self.assertEqual(response.status_code, 200)
+        with CaptureQueriesContext(connection) as ctx:
+            replay = self.client.post(url, {'markup_percentage': 80}, format='json', HTTP_IDEMPOTENCY_KEY='k-1')
+        self.assertEqual(replay.status_code, 200)
+        self.assertEqual(replay.data, response.data)
+        self.assertFalse([q for q in ctx.captured_queries if q['sql'].startswith('UPDATE')])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.precio, Decimal('150.00'))
+
+    def test_favorite_list_loads_only_brief_product_columns(self):
+        Favorite.objects.create(user=self.user, product=self.product)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('favorites-list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['product']['id'], self.product.id)
+        self.assertEqual(set(response.data[0]['product']), {'id', 'nombre', 'precio'})
+        favorite_sql = [q['sql'] for q in ctx.captured_queries if 'market_favorite' in q['sql']]
+        self.assertEqual(len(favorite_sql), 1)
+        self.assertNotIn('descripcion', favorite_sql[0])
+
+    def test_favorite_list_query_count_independent_of_size(self):
+        Favorite.objects.create(user=self.user, product=self.product)
+        with CaptureQueriesContext(connection) as una:
+            self.client.get(reverse('favorites-list'))
+        for _ in range(4):
+            producto = Product.objects.create(nombre=fake.word(), precio=Decimal('10.00'), categoria=self.category)
+            Favorite.objects.create(user=self.user, product=producto)
+        with CaptureQueriesContext(connection) as cinco:
+            response = self.client.get(reverse('favorites-list'))
+        self.assertEqual(len(response.data), 5)
+        self.assertEqual(len(cinco.captured_queries), len(una.captured_queries))
+
+    def test_favorite_list_cursor_pagination(self):
+        for _ in range(3):
+            producto = Product.objects.create(nombre=fake.word(), precio=Decimal('10.00'), categoria=self.category)
+            Favorite.objects.create(user=self.user, product=producto)
+
+        response = self.client.get(reverse('favorites-list'))
+        self.assertIsInstance(response.data, list)
+
+        response = self.client.get(reverse('favorites-list') + '?page_size=2')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNotNone(response.data['next'])
+        primera = [fav['id'] for fav in response.data['results']]
+        self.assertEqual(primera, sorted(primera, reverse=True))
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNone(response.data['next'])
+
+    def test_favorite_destroy_by_product_single_delete(self):
+        Favorite.objects.create(user=self.user, product=self.product)
+        # El id de la ruta se ignora cuando llega ?product_id
+        url = reverse('favorites-detail', kwargs={'pk': 0}) + f'?product_id={self.product.id}'
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.delete(url)
+        self.assertEqual(response.status_code, 204)
+        favorite_sql = [q['sql'] for q in ctx.captured_queries if 'market_favorite' in q['sql']]
+        self.assertEqual(len(favorite_sql), 1)
+        self.assertTrue(favorite_sql[0].startswith('DELETE'))
+
+        response = self.client.delete(url)
+        self.assertEqual(response.status_code, 404)
+
+    def test_favorite_bulk_merges_with_single_insert(self):
+        otro = Product.objects.create(nombre=fake.word(), precio=Decimal('10.00'), categoria=self.category)
+        Favorite.objects.create(user=self.user, product=self.product)
+        url = reverse('favorites-bulk')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(url, {'product_ids': [self.product.id, otro.id, str(otro.id), 999999]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['merged'], 1)
+        self.assertEqual(response.data['skipped'], 1)
+        self.assertEqual(len([q for q in ctx.captured_queries if q['sql'].startswith('INSERT')]), 1)
+        self.assertEqual(Favorite.objects.filter(user=self.user).count(), 2)
+
+        response = self.client.post(url, {'product_ids': ['abc']}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_shipment_list_total_productos_annotated(self):
+        # self.shipment (setUp) ya es el envío de self.order: se le suma un segundo detalle
+        OrderDetail.objects.create(pedido=self.order, producto=self.product, cantidad=2)
+        response = self.client.get(reverse('shipment-list'))
+        self.assertEqual(response.status_code, 200)
+        detalle = response.data[0]['pedido_detalle']
+        self.assertEqual(detalle['total_productos'], self.order.detalles.count())
+        self.assertEqual(len(detalle['productos']), detalle['total_productos'])
+
+    def test_my_orders_query_count_constant(self):
+        url = reverse('order-my-orders')
+        with CaptureQueriesContext(connection) as base:
+            self.client.get(url)
+
+        for _ in range(3):
+            order = Order.objects.create(usuario=self.user, estado='pendiente')
+            OrderDetail.objects.create(pedido=order, producto=self.product, cantidad=1)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 4)
+        self.assertEqual(len(ctx.captured_queries), len(base.captured_queries))
+
+    def test_cart_items_list_query_count_constant(self):
+        url = reverse('cartitem-list')
+        CartItem.objects.create(carrito=self.cart, producto=self.product, cantidad=1)
+        with CaptureQueriesContext(connection) as base:
+            self.client.get(url)
+
+        for _ in range(3):
+            product = Product.objects.create(
+                nombre=fake.word(), precio=Decimal('10.00'), stock=10, categoria=self.category
+            )
+            CartItem.objects.create(carrito=self.cart, producto=product, cantidad=1)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_items'], 4)
+        self.assertEqual(len(ctx.captured_queries), len(base.captured_queries))
+
+    def test_cart_checkout_updates_stock_vendido_in_one_query(self):
+        products = [
+            Product.objects.create(
+                nombre=fake.word(), precio=Decimal('10.00'), stock_proveedor=5, categoria=self.category
+            ) for _ in range(3)
+        ]
+        for product in products:
+            CartItem.objects.create(carrito=self.cart, producto=product, cantidad=2)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse('cart-checkout'))
+        self.assertEqual(response.status_code, 201)
+        product_updates = [
+            q for q in ctx.captured_queries
+            if q['sql'].startswith('UPDATE') and 'market_product' in q['sql']
+        ]
+        self.assertEqual(len(product_updates), 1)
+        self.assertEqual(OrderDetail.objects.filter(pedido_id=response.data['pedido_id']).count(), 3)
+        for product in products:
+            product.refresh_from_db()
+            self.assertEqual(product.stock_vendido, 2)
+
+    def test_product_add_to_cart_returns_cart_summary(self):
+        product = Product.objects.create(
+            nombre=fake.word(), precio=Decimal('10.00'), stock_proveedor=10, categoria=self.category
+        )
+        CartItem.objects.create(carrito=self.cart, producto=self.product, cantidad=1)
+        url = reverse('product-add-to-cart', kwargs={'pk': product.id})
+        response = self.client.post(url, {'cantidad': 3}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_items'], 4)
+        self.assertEqual(response.data['total'], self.cart.total())
+        # En el JSON el total sale como número, no como string
+        self.assertEqual(json.loads(response.content)['total'], float(self.cart.total()))
+
+    def test_product_list_paginates_on_request(self):
+        for _ in range(3):
+            Product.objects.create(nombre=fake.word(), precio=Decimal('10.00'), categoria=self.category)
+
+        response = self.client.get(reverse('product-list'))
+        self.assertIsInstance(response.data, list)
+
+        # Sin orden explícito Django avisa con UnorderedObjectListWarning
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', UnorderedObjectListWarning)
+            response = self.client.get(reverse('product-list') + '?page_size=2')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 4)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIn('categoria', response.data['results'][0])
+        self.assertEqual([p['id'] for p in response.data['results']], sorted(p['id'] for p in response.data['results']))
+
+    def test_product_add_to_cart_accumulates_quantity(self):
+        product = Product.objects.create(
+            nombre=fake.word(), precio=Decimal('10.00'), stock_proveedor=10, categoria=self.category
+        )
+        url = reverse('product-add-to-cart', kwargs={'pk': product.id})
+        self.client.post(url, {'cantidad': 2}, format='json')
+        response = self.client.post(url, {'cantidad': 3}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['mensaje'], 'Producto actualizado en el carrito')
+        self.assertEqual(CartItem.objects.get(carrito=self.cart, producto=product).cantidad, 5)
+
+        response = self.client.post(url, {'cantidad': 6}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(CartItem.objects.get(carrito=self.cart, producto=product).cantidad, 5)
+
+    def test_product_list_etag_not_modified(self):
+        url = reverse('product-list')
+        response = self.client.get(url)
+        etag = response['ETag']
+
+        # El 304 no consulta las tablas del catálogo
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse([q for q in ctx.captured_queries if 'market_product' in q['sql']])
+
+        print("PENDIENTES", connection.run_on_commit)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.product.nombre = 'otro-nombre'
+            self.product.save()
+            self.category.save()
+        self.assertEqual(len(callbacks), 1)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        # Las escrituras con update() no disparan señales: también cambian la versión
+        etag = response['ETag']
+        admin = User.objects.create_user(
+            username=fake.unique.user_name(), email=fake.unique.email(),
+            password='testpass123', role='admin', is_staff=True
+        )
+        self.client.force_authenticate(user=admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('reset-stock-vendido', kwargs={'pk': self.product.id}))
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_sync_products_status(self):
+        from market.tasks import cache, sync_status_cache_key
+        admin = User.objects.create_user(
+            username=fake.unique.user_name(), email=fake.unique.email(),
+            password='testpass123', role='admin', is_staff=True
+        )
+        self.client.force_authenticate(user=admin)
+        cache.set(sync_status_cache_key('abc123'), {'state': 'SUCCESS', 'result': {'success': True}})
+
+        response = self.client.get(reverse('sync-products-status', kwargs={'task_id': 'abc123'}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['state'], 'SUCCESS')
+
+        response = self.client.get(reverse('sync-products-status', kwargs={'task_id': 'inexistente'}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_manual_sync_conflict_while_running(self):
+        from market.tasks import SYNC_LOCK_KEY, SYNC_LAST_KEY, cache
+        admin = User.objects.create_user(
+            username=fake.unique.user_name(), email=fake.unique.email(),
+            password='testpass123', role='admin', is_staff=True
+        )
+        self.client.force_authenticate(user=admin)
+        url = reverse('manual-sync-products')
+        cache.set(SYNC_LOCK_KEY, 'abc123')
+        try:
+            response = self.client.post(url)
+            self.assertEqual(response.status_code, 409)
+            self.assertEqual(response.data['task_id'], 'abc123')
+        finally:
+            cache.delete(SYNC_LOCK_KEY)
+
+        cache.set(SYNC_LAST_KEY, {'success': True, 'total': 3})
+        response = self.client.post(url + '?cached=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total'], 3)
+        cache.delete(SYNC_LAST_KEY)
+
+    def test_manual_sync_conflict_not_replayed_by_idempotency_key(self):
+        admin = User.objects.create_user(
+            username=fake.unique.user_name(), email=fake.unique.email(),
+            password='testpass123', role='admin', is_staff=True
+        )
+        self.client.force_authenticate(user=admin)
+        url = reverse('manual-sync-products')
+        # El 409 es transitorio: al liberarse el lock el mismo reintento debe lanzar la tarea
+        with patch('market.views.lanzar_sincronizacion', side_effect=[None, 'nueva']), \
+                patch('market.views.sincronizacion_en_curso', return_value='abc123'):
+            response = self.client.post(url, HTTP_IDEMPOTENCY_KEY='k-sync')
+            self.assertEqual(response.status_code, 409)
+            response = self.client.post(url, HTTP_IDEMPOTENCY_KEY='k-sync')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['task_id'], 'nueva')
+
+    def test_sync_does_not_release_foreign_lock(self):
+        from market.tasks import SYNC_LOCK_KEY, ejecutar_sincronizacion, cache
+        # El lock expiró y lo tomó otra sincronización: no hay que liberarlo
+        cache.set(SYNC_LOCK_KEY, 'otra')
+        try:
+            with patch('market.tasks.sync_external_products', return_value={'success': True}):
+                ejecutar_sincronizacion('abc123')
+            self.assertEqual(cache.get(SYNC_LOCK_KEY), 'otra')
+        finally:
+            cache.delete(SYNC_LOCK_KEY)
+
+    def test_manual_sync_launches_command_process(self):
+        from market.tasks import SYNC_LOCK_KEY, cache, get_sync_status
+        admin = User.objects.create_user(
+            username=fake.unique.user_name(), email=fake.unique.email(),
+            password='testpass123', role='admin', is_staff=True
+        )
+        self.client.force_authenticate(user=admin)
+        try:
+            with patch('market.tasks.subprocess.Popen') as popen:
+                response = self.client.post(reverse('manual-sync-products'))
+            self.assertEqual(response.status_code, 202)
+            task_id = response.data['task_id']
+            self.assertEqual(popen.call_args.args[0][-3:], ['sync_external_products', '--task-id', task_id])
+            self.assertEqual(get_sync_status(task_id)['state'], 'PENDING')
+
+            with patch('market.tasks.sync_external_products', return_value={'success': True}):
+                call_command('sync_external_products', task_id=task_id, stdout=StringIO())
+            self.assertEqual(get_sync_status(task_id)['state'], 'SUCCESS')
+            self.assertIsNone(cache.get(SYNC_LOCK_KEY))
+        finally:
+            cache.delete(SYNC_LOCK_KEY)
+
+    def test_update_product_price_single_update(self):
+        admin = User.objects.create_user(
+            username=fake.unique.user_name(), email=fake.unique.email(),
+            password='testpass123', role='admin', is_staff=True
+        )
+        self.client.force_authenticate(user=admin)
+        url = reverse('update-product-price', kwargs={'pk': self.product.id})
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.patch(url + '?producto=0', {'precio': '123.45'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        product_sql = [q['sql'] for q in ctx.captured_queries if 'market_product' in q['sql']]
+        self.assertEqual(len(product_sql), 1)
+        self.assertTrue(product_sql[0].startswith('UPDATE'))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.precio, Decimal('123.45'))
+        self.assertTrue(self.product.precio_manual)
+
+        response = self.client.patch(url, {'precio': '99.90'}, format='json')
+        self.assertEqual(float(response.data['producto']['precio']), 99.9)
+
+        url = reverse('update-product-price', kwargs={'pk': 999999})
+        response = self.client.patch(url, {'precio': '10'}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+        response = self.client.patch(url, {'precio': 'abc'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('precio', response.data['error'])
+
+        # Igual que antes de validar con el serializer: el precio debe ser mayor que cero
+        url = reverse('update-product-price', kwargs={'pk': self.product.id})
+        response = self.client.patch(url, {'precio': '0'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.precio, Decimal('99.90'))
+        response = self.client.post(reverse('bulk-update-markup'), {'markup_percentage': 'x'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_reset_stock_vendido_single_update(self):
+        admin = User.objects.create_user(
+            username=fake.unique.user_name(), email=fake.unique.email(),
+            password='testpass123', role='admin', is_staff=True
+        )
+        self.client.force_authenticate(user=admin)
+        self.product.stock_proveedor = 7
+        self.product.stock_vendido = 5
+        self.product.save()
+        url = reverse('reset-stock-vendido', kwargs={'pk': self.product.id})
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['stock_disponible'], 7)
+        product_sql = [q['sql'] for q in ctx.captured_queries if 'market_product' in q['sql']]
+        self.assertEqual(len(product_sql), 2)
+        self.assertTrue(product_sql[0].startswith('UPDATE'))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_vendido, 0)
+
+        response = self.client.post(reverse('reset-stock-vendido', kwargs={'pk': 999999}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_favorite_list_varies_on_authorization(self):
+        cliente = User.objects.create_user(
+            username=fake.unique.user_name(), email=fake.unique.email(),
+            password='testpass123', role='client'
+        )
+        self.client.force_authenticate(user=cliente)
+        url = reverse('favorites-list')
+        self.client.post(url, {'product_id': self.product.id}, format='json')
+        response = self.client.get(url)
+        self.assertEqual(len(response.data), 1)
+        self.assertIn('Authorization', response['Vary'])
+
+        detalle = reverse('favorites-detail', kwargs={'pk': 0}) + f'?product_id={self.product.id}'
+        self.client.delete(detalle)
+        self.assertEqual(self.client.get(url).data, [])
+
+    def test_order_force_delete_restores_grouped_stock(self):
+        self.product.stock = 10
+        self.product.save()
+        OrderDetail.objects.create(pedido=self.order, producto=self.product, cantidad=3)
+        url = reverse('order-force-delete', kwargs={'pk': self.order.id})
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Order.objects.filter(pk=self.order.id).exists())
+        self.product.refresh_from_db()
+        # 2 unidades del detalle de setUp + 3 del nuevo
+        self.assertEqual(self.product.stock, 15)
+
+    def test_sync_products_stream_emits_final_state(self):
+        from market.tasks import cache, sync_status_cache_key
+        admin = User.objects.create_user(
+            username=fake.unique.user_name(), email=fake.unique.email(),
+            password='testpass123', role='admin', is_staff=True
+        )
+        self.client.force_authenticate(user=admin)
+        key = sync_status_cache_key('abc123')
+        cache.set(key, {'state': 'STARTED', 'result': None})
+        final = {'state': 'SUCCESS', 'result': {'nuevos': 2}}
+
+        url = reverse('sync-products-stream', kwargs={'task_id': 'abc123'})
+        response = self.client.get(url, HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        # La tarea termina durante la primera espera del polling
+        with patch('market.tasks.time.sleep', side_effect=lambda _: cache.set(key, final)):
+            cuerpo = b''.join(response.streaming_content).decode()
+        eventos = cuerpo.split('\n\n')
+        self.assertEqual(eventos[-1], '')
+        self.assertEqual(json.loads(eventos[0][len('data: '):]), {'state': 'STARTED', 'result': None})
+        self.assertEqual(json.loads(eventos[1][len('data: '):]), final)
+        self.assertEqual(eventos[2], 'event: end\ndata: SUCCESS')
+        self.assertEqual(len(eventos), 4)
+
+        # Ya terminada: 204, el EventSource no reconecta
+        response = self.client.get(url, HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response.status_code, 204)
+
+        response = self.client.get(reverse('sync-products-stream', kwargs={'task_id': 'otra'}))
+        self.assertEqual(response.status_code, 404)
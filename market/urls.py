@@ -2,7 +2,8 @@ from django.urls import path, include
 from rest_framework import routers
 from market import views
 
-router = routers.DefaultRouter()
+# SimpleRouter: sin vista raíz ni rutas con sufijo de formato (.json), menos patrones que resolver
+router = routers.SimpleRouter()
 router.register(r'categories', views.CategoryViewSet, basename='category')
 router.register(r'products', views.ProductViewSet, basename='product')
 router.register(r'orders', views.OrderViewSet, basename='order')
@@ -17,6 +18,8 @@ urlpatterns = [
     
     # Endpoints de sincronización de productos
     path('market/sync-external/', views.manual_sync_products, name='manual-sync-products'),
+    path('market/sync-external/<str:task_id>/', views.sync_products_status, name='sync-products-status'),
+    path('market/sync-external/<str:task_id>/stream/', views.sync_products_stream, name='sync-products-stream'),
     path('market/products/<int:pk>/update-price/', views.update_product_price, name='update-product-price'),
     path('market/products/<int:pk>/reset-stock/', views.reset_stock_vendido, name='reset-stock-vendido'),
     path('market/products/bulk-markup/', views.bulk_update_markup, name='bulk-update-markup'),
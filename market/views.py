@@ -1,15 +1,73 @@
+import hashlib
+from decimal import Decimal
 from django.shortcuts import render, get_object_or_404
-from rest_framework import viewsets, status
+from django.http import Http404
+from rest_framework import viewsets, status, serializers
 from .serializer import *
 from .models import *
+from .mixins import AutoPrefetchViewSetMixin, ExportMixin
+from .decorators import idempotent
+from .pagination import FavoriteCursorPagination, ProductPagination
+from .filters import CategoryFilter, ProductFilter
+from django_filters.rest_framework import DjangoFilterBackend
 from Velorum.permissions import *
+from account_admin.models import STAFF_ROLES
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_headers
+from django.db import transaction
+from django.utils import timezone
+from django.db.models import (
+    Prefetch, F, Case, When, Count, Sum, Value, DecimalField, FloatField, IntegerField, ExpressionWrapper,
+    Exists, OuterRef
+)
+from django.db.models.functions import Cast, Coalesce
 
 # Create your views here.
 
+def _require_staff(request):
+    """Respuesta 403 si el usuario no es admin/operador; None si puede continuar"""
+    if getattr(request.user, 'role', None) not in STAFF_ROLES:
+        return Response({'error': 'No autorizado'}, status=status.HTTP_403_FORBIDDEN)
+    return None
+
+# Montos de las respuestas armadas a mano: mismo formato que los DecimalField de los
+# serializers (2 decimales, número en el JSON) sin pasar por float() en la vista
+_CAMPO_MONTO = serializers.DecimalField(max_digits=None, decimal_places=2, coerce_to_string=False)
+
+def _monto(valor):
+    return _CAMPO_MONTO.to_representation(valor)
+
+def _listado_etag(request, *args, **kwargs):
+    """
+    ETag de los listados del catálogo: combina la URL (filtros y página) con la versión
+    del catálogo, que cambia con altas, bajas y ediciones de productos o categorías.
+    """
+    partes = [request.get_full_path(), version_catalogo()]
+    return hashlib.md5(':'.join(partes).encode()).hexdigest()
+
+def _sumar_stock(campo, cantidades):
+    """
+    Suma cantidades ({producto_id: cantidad}) al campo de stock indicado
+    de cada producto con un único UPDATE (CASE por id).
+    """
+    if not cantidades:
+        return 0
+    programar_version_catalogo()
+    return Product.objects.filter(id__in=cantidades).update(**{
+        campo: Case(
+            *[When(id=producto_id, then=F(campo) + cantidad) for producto_id, cantidad in cantidades.items()],
+            default=F(campo),
+            output_field=IntegerField()
+        ),
+        'actualizado': timezone.now()
+    })
+
+@method_decorator(condition(etag_func=_listado_etag), name='list')
 class CategoryViewSet(viewsets.ModelViewSet):
     """
     ViewSet para gestionar las categorías de productos.
@@ -19,19 +77,12 @@ class CategoryViewSet(viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer 
     permission_classes = [CategoryPermission]
-    
-    def get_queryset(self):
-        """Filtrado para categorías"""
-        queryset = Category.objects.all()
-        
-        # Filtrado por nombre
-        nombre = self.request.query_params.get('nombre', None)
-        if nombre:
-            queryset = queryset.filter(nombre__icontains=nombre)
-            
-        return queryset
+    # Filtrado por nombre (?nombre=)
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = CategoryFilter
 
-class ProductViewSet(viewsets.ModelViewSet):
+@method_decorator(condition(etag_func=_listado_etag), name='list')
+class ProductViewSet(AutoPrefetchViewSetMixin, ExportMixin, viewsets.ModelViewSet):
     """
     ViewSet para gestionar productos.
     - Administradores y operadores: acceso completo (CRUD) 
@@ -41,31 +92,56 @@ class ProductViewSet(viewsets.ModelViewSet):
     serializer_class = ProductSerializer
     permission_classes = [ProductPermission]
     parser_classes = [JSONParser, MultiPartParser, FormParser]
+    pagination_class = ProductPagination
+    # Filtrado por nombre, categoría o precio (ver ProductFilter)
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = ProductFilter
     
     def get_queryset(self):
-        """Permite filtrar productos por nombre, categoría o precio"""
-        queryset = Product.objects.all()
-        nombre = self.request.query_params.get('nombre', None)
-        categoria = self.request.query_params.get('categoria', None)
-        precio_min = self.request.query_params.get('precio_min', None)
-        precio_max = self.request.query_params.get('precio_max', None)
-        
-        if nombre:
-            queryset = queryset.filter(nombre__icontains=nombre)
-        if categoria:
-            queryset = queryset.filter(categoria__id=categoria)
-        if precio_min:
-            queryset = queryset.filter(precio__gte=precio_min)
-        if precio_max:
-            queryset = queryset.filter(precio__lte=precio_max)
-            
+        # Orden estable: la paginación no debe depender del orden de la base
+        queryset = Product.objects.order_by('id')
+        # En list las categorías se resuelven con un mapa id -> datos (ver list)
+        if self.action != 'list':
+            queryset = queryset.select_related('categoria')
+        # Solo en lectura: tras una escritura los valores anotados quedarían desactualizados
+        if self.action in ['list', 'retrieve', 'export']:
+            queryset = queryset.con_campos_calculados()
         return queryset
+
+    def auto_prefetch(self, queryset):
+        # list resuelve las categorías con categorias_map, sin JOIN
+        if self.action == 'list':
+            return queryset
+        return super().auto_prefetch(queryset)
+
+    def list(self, request, *args, **kwargs):
+        """
+        Lista productos resolviendo las categorías de la página con una sola
+        consulta; el serializer las toma del mapa en lugar de la FK de cada fila.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        productos = list(page if page is not None else queryset)
+
+        categoria_ids = {producto.categoria_id for producto in productos}
+        context = self.get_serializer_context()
+        context['categorias_map'] = {
+            categoria.id: {'id': categoria.id, 'nombre': categoria.nombre}
+            for categoria in Category.objects.filter(id__in=categoria_ids).only('id', 'nombre')
+        }
+
+        serializer = self.get_serializer(productos, many=True, context=context)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
         
     @action(detail=True, methods=['post'], permission_classes=[AddToCartPermission])
+    @transaction.atomic
     def add_to_cart(self, request, pk=None):
         """Endpoint personalizado para agregar producto al carrito"""
-        # 1. Obtener el producto
+        # 1. Obtener el producto, bloqueando su fila hasta el final de la transacción
         producto = self.get_object()
+        producto = Product.objects.select_for_update().get(pk=producto.pk)
         
         # 2. Obtener la cantidad solicitada (default: 1)
         cantidad = int(request.data.get('cantidad', 1))
@@ -87,44 +163,42 @@ class ProductViewSet(viewsets.ModelViewSet):
         # 5. Obtener o crear el carrito del usuario
         carrito, created = Cart.objects.get_or_create(usuario=request.user)
         
-        # 6. Buscar si el producto ya está en el carrito
-        try:
-            item = CartItem.objects.get(carrito=carrito, producto=producto)
-            # 6.1 Si existe, actualizar cantidad (verificando stock)
+        # 6. Crear el item o, si el producto ya está en el carrito, sumar la cantidad
+        item, creado = CartItem.objects.select_for_update().get_or_create(
+            carrito=carrito,
+            producto=producto,
+            defaults={'cantidad': cantidad}
+        )
+        if creado:
+            mensaje = 'Producto agregado al carrito'
+        else:
+            # 6.1 Verificar stock para la cantidad acumulada
             nueva_cantidad = item.cantidad + cantidad
             if nueva_cantidad > producto.stock_disponible:
                 return Response(
                     {'error': f'Stock insuficiente. Solo hay {producto.stock_disponible} unidades disponibles'}, 
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            item.cantidad = nueva_cantidad
-            item.save()
+            CartItem.objects.filter(pk=item.pk).update(cantidad=F('cantidad') + cantidad)
             mensaje = 'Producto actualizado en el carrito'
-        except CartItem.DoesNotExist:
-            # 6.2 Si no existe, crear nuevo item
-            CartItem.objects.create(
-                carrito=carrito,
-                producto=producto,
-                cantidad=cantidad
-            )
-            mensaje = 'Producto agregado al carrito'
         
         # 7. Preparar respuesta con los datos del carrito actualizado
+        resumen = carrito.resumen()
         datos_carrito = {
             'mensaje': mensaje,
-            'total_items': carrito.cantidad_items(),
-            'total': float(carrito.total()),
+            'total_items': resumen['cantidad_items'],
+            'total': _monto(resumen['total']),
             'producto_agregado': {
                 'id': producto.id,
                 'nombre': producto.nombre,
-                'precio': float(producto.precio),
+                'precio': _monto(producto.precio),
                 'cantidad': cantidad,
             }
         }
         
         return Response(datos_carrito, status=status.HTTP_200_OK)
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(AutoPrefetchViewSetMixin, ExportMixin, viewsets.ModelViewSet):
     """
     ViewSet para gestionar órdenes/pedidos.
     - Administradores y operadores: acceso completo a todas las órdenes
@@ -141,9 +215,36 @@ class OrderViewSet(viewsets.ModelViewSet):
         Este método se usa para las rutas principales (GET /orders/, GET /orders/{id}/).
         """
         user = self.request.user
-        if hasattr(user, 'role') and user.role in ['admin', 'operator']:
-            return Order.objects.all()
-        return Order.objects.filter(usuario=user)
+        queryset = Order.objects.all()
+        if self.action == 'list':
+            # OrderListSerializer solo necesita estas columnas y los ids de los detalles
+            queryset = queryset.only(
+                'id', 'usuario', 'fecha', 'estado', 'total', 'direccion_envio'
+            ).prefetch_related(
+                Prefetch('detalles', queryset=OrderDetail.objects.only('id', 'pedido'))
+            )
+        else:
+            queryset = self._with_detalles(queryset)
+        if hasattr(user, 'role') and user.role in STAFF_ROLES:
+            return queryset
+        return queryset.filter(usuario=user)
+
+    def get_serializer_class(self):
+        # El listado usa la variante compacta; la edición (PUT) el formato simplificado
+        if self.action == 'list':
+            return OrderListSerializer
+        if self.action == 'update':
+            return OrderEditSerializer
+        return super().get_serializer_class()
+
+    def _with_detalles(self, queryset):
+        """Usuario y detalles (con su producto) en consultas fijas, sin N+1 al serializar"""
+        return queryset.select_related('usuario').prefetch_related(
+            Prefetch('detalles', queryset=OrderDetail.objects.select_related('producto__categoria')),
+            # UserSerializer (fields='__all__') también lee los M2M del usuario
+            Prefetch('usuario__groups'),
+            Prefetch('usuario__user_permissions')
+        )
     
     @action(detail=False, methods=['get'], url_path='my-orders', permission_classes=[IsAuthenticated])
     def my_orders(self, request):
@@ -152,7 +253,7 @@ class OrderViewSet(viewsets.ModelViewSet):
         vea solo sus propios pedidos.
         """
         user = request.user
-        orders = Order.objects.filter(usuario=user).order_by('-fecha')
+        orders = self._with_detalles(Order.objects.filter(usuario=user)).order_by('-fecha')
         serializer = self.get_serializer(orders, many=True)
         return Response(serializer.data)
 
@@ -194,6 +295,16 @@ class OrderViewSet(viewsets.ModelViewSet):
     
     def _process_order_details(self, order, detalles_data):
         """Procesa los detalles de una orden durante la actualización"""
+        # Todos los productos y detalles involucrados en una consulta cada uno
+        productos = Product.objects.in_bulk(
+            {int(detalle_data['producto']) for detalle_data in detalles_data if detalle_data.get('producto')}
+        )
+        detalles_existentes = OrderDetail.objects.filter(pedido=order).select_related('producto').in_bulk(
+            {int(detalle_data['id']) for detalle_data in detalles_data if detalle_data.get('id')}
+        )
+        nuevos_detalles = []
+        detalles_editados = []
+        ajustes_stock = {}
         for detalle_data in detalles_data:
             producto_id = detalle_data.get('producto')
             cantidad = detalle_data.get('cantidad', 1)
@@ -202,48 +313,115 @@ class OrderViewSet(viewsets.ModelViewSet):
             if not producto_id:
                 continue
                 
-            try:
-                producto = Product.objects.get(id=producto_id)
+            producto = productos.get(int(producto_id))
+            if producto is None:
+                # Ignorar productos que no existen
+                continue
                 
-                if detalle_id:
-                    # Actualizar detalle existente
-                    try:
-                        detalle = OrderDetail.objects.get(id=detalle_id, pedido=order)
-                        
-                        # Si la cantidad cambia, ajustar el stock
-                        if detalle.cantidad != cantidad:
-                            # Devolver el stock anterior
-                            producto.stock += detalle.cantidad
-                            # Restar el nuevo stock
-                            if producto.stock < cantidad:
-                                raise serializers.ValidationError(
-                                    f"Stock insuficiente para {producto.nombre}"
-                                )
-                            producto.stock -= cantidad
-                            producto.save()
-                        
-                        detalle.cantidad = cantidad
-                        detalle.save()
-                    except OrderDetail.DoesNotExist:
-                        raise serializers.ValidationError(
-                            f"Detalle con id {detalle_id} no pertenece a esta orden"
-                        )
-                else:
-                    # Crear nuevo detalle
+            if detalle_id:
+                # Actualizar detalle existente
+                detalle = detalles_existentes.get(int(detalle_id))
+                if detalle is None:
+                    raise serializers.ValidationError(
+                        f"Detalle con id {detalle_id} no pertenece a esta orden"
+                    )
+                
+                # Si la cantidad cambia, ajustar el stock
+                if detalle.cantidad != cantidad:
+                    # Devolver el stock anterior
+                    producto.stock += detalle.cantidad
+                    # Restar el nuevo stock
                     if producto.stock < cantidad:
                         raise serializers.ValidationError(
                             f"Stock insuficiente para {producto.nombre}"
                         )
-                        
-                    OrderDetail.objects.create(
-                        pedido=order,
-                        producto=producto,
-                        cantidad=cantidad
+                    producto.stock -= cantidad
+                    ajustes_stock[producto.id] = ajustes_stock.get(producto.id, 0) + detalle.cantidad - cantidad
+                
+                detalle.cantidad = cantidad
+                # bulk_update no pasa por OrderDetail.save(): el subtotal se calcula acá
+                detalle.subtotal = detalle.producto.precio * cantidad
+                detalles_editados.append(detalle)
+            else:
+                # Nuevo detalle: se acumula para crearlos todos juntos
+                if producto.stock < cantidad:
+                    raise serializers.ValidationError(
+                        f"Stock insuficiente para {producto.nombre}"
                     )
-            except Product.DoesNotExist:
-                # Ignorar productos que no existen
-                pass
+                    
+                nuevos_detalles.append(OrderDetail(
+                    pedido=order,
+                    producto=producto,
+                    cantidad=cantidad,
+                    # bulk_create no pasa por OrderDetail.save(): el subtotal se calcula acá
+                    subtotal=producto.precio * cantidad
+                ))
+        
+        # Un UPDATE de stock, uno de detalles y un INSERT; sin señales por fila:
+        # perform_update recalcula el total una sola vez al final
+        _sumar_stock('stock', {pid: ajuste for pid, ajuste in ajustes_stock.items() if ajuste})
+        OrderDetail.objects.bulk_update(detalles_editados, ['cantidad', 'subtotal'])
+        OrderDetail.objects.bulk_create(nuevos_detalles)
     
+    @action(detail=True, methods=['post'], url_path='add-items')
+    def add_items(self, request, pk=None):
+        """
+        Agrega varios productos al pedido en una sola operación.
+        Body: { "detalles_input": [{"producto": 1, "cantidad": 2}, ...] }
+        """
+        order = self.get_object()
+
+        if order.estado in ['entregado', 'cancelado']:
+            return Response(
+                {'error': f'No se puede modificar un pedido en estado {order.estado}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        input_serializer = OrderItemInputSerializer(data=request.data.get('detalles_input', []), many=True)
+        input_serializer.is_valid(raise_exception=True)
+        items = input_serializer.validated_data
+        if not items:
+            return Response(
+                {'error': 'Debe enviar al menos un producto en detalles_input'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        with transaction.atomic():
+            # Una sola consulta (con bloqueo) para todos los productos involucrados
+            productos = Product.objects.select_for_update().in_bulk({item['producto'] for item in items})
+
+            cantidades = {}
+            for item in items:
+                cantidades[item['producto']] = cantidades.get(item['producto'], 0) + item['cantidad']
+
+            for producto_id, cantidad in cantidades.items():
+                producto = productos.get(producto_id)
+                if producto is None:
+                    raise serializers.ValidationError(f"El producto {producto_id} no existe")
+                if cantidad > producto.stock_disponible:
+                    raise serializers.ValidationError(
+                        f"Stock insuficiente para {producto.nombre}. Solo hay {producto.stock_disponible} unidades disponibles"
+                    )
+                producto.stock_vendido += cantidad
+                producto.actualizado = timezone.now()
+
+            # bulk_create no ejecuta OrderDetail.save(), el subtotal se calcula aquí
+            OrderDetail.objects.bulk_create([
+                OrderDetail(
+                    pedido=order,
+                    producto=productos[item['producto']],
+                    cantidad=item['cantidad'],
+                    subtotal=productos[item['producto']].precio * item['cantidad']
+                ) for item in items
+            ], batch_size=500)
+            Product.objects.bulk_update(
+                [productos[producto_id] for producto_id in cantidades], ['stock_vendido', 'actualizado']
+            )
+            programar_version_catalogo()
+            order.total_update()
+
+        return Response(self.get_serializer(order).data, status=status.HTTP_201_CREATED)
+
     @action(detail=True, methods=['post'], url_path='remove-detail/(?P<detail_id>[^/.]+)')
     def remove_detail(self, request, pk=None, detail_id=None):
         """Elimina un detalle específico de la orden"""
@@ -262,7 +440,7 @@ class OrderViewSet(viewsets.ModelViewSet):
             # Devolver el stock
             producto = detail.producto
             producto.stock += detail.cantidad
-            producto.save()
+            producto.save(update_fields=['stock', 'actualizado'])
             
             # Eliminar el detalle
             detail.delete()
@@ -271,7 +449,7 @@ class OrderViewSet(viewsets.ModelViewSet):
             order.total_update()
             
             return Response(
-                {'status': 'Detalle eliminado', 'total_actualizado': float(order.total)}, 
+                {'status': 'Detalle eliminado', 'total_actualizado': _monto(order.total)}, 
                 status=status.HTTP_200_OK
             )
         except OrderDetail.DoesNotExist:
@@ -300,7 +478,7 @@ class OrderViewSet(viewsets.ModelViewSet):
         
         # Cambiar estado
         order.estado = 'cancelado'
-        order.save()
+        order.save(update_fields=['estado'])
         
         return Response({"message": "Orden cancelada correctamente"})
     
@@ -309,34 +487,41 @@ class OrderViewSet(viewsets.ModelViewSet):
         """Endpoint para actualizar el total del pedido"""
         order = self.get_object()
         order.total_update()  # Usa el método personalizado del modelo
-        return Response({'status': 'total actualizado', 'total': order.total}, 
+        return Response({'status': 'total actualizado', 'total': _monto(order.total)}, 
                         status=status.HTTP_200_OK)
 
     @action(detail=True, methods=['post'])
+    @transaction.atomic
     def force_delete(self, request, pk=None):
         """
         Elimina forzadamente un pedido (solo admin/operator),
-        restaurando stock y cerrando pagos abiertos previamente.
+        restaurando stock y eliminando sus pagos.
         """
-        if getattr(request.user, 'role', None) not in ['admin', 'operator']:
-            return Response({'error': 'No autorizado'}, status=status.HTTP_403_FORBIDDEN)
+        denegado = _require_staff(request)
+        if denegado is not None:
+            return denegado
         order = self.get_object()
-        # 1) Cerrar pagos abiertos (pendiente/en_revision) como fallido
-        abiertos = Pay.objects.filter(pedido=order, estado__in=['pendiente', 'en_revision'])
-        for p in abiertos:
-            p.fail()
-        # 2) Restaurar stock si el pedido no estaba cancelado aún
-        if order.estado != 'cancelado':
-            for det in order.detalles.all():
-                prod = det.producto
-                prod.stock += det.cantidad
-                prod.save()
-        # 3) Eliminar pagos y pedido
+        # Bloquear el pedido: dos borrados concurrentes no deben devolver el stock dos veces
+        estado = Order.objects.select_for_update().filter(pk=order.pk).values_list('estado', flat=True).first()
+        if estado is None:
+            return Response({'error': 'El pedido ya fue eliminado'}, status=status.HTTP_404_NOT_FOUND)
+        # 1) Restaurar stock si el pedido no estaba cancelado aún
+        if estado != 'cancelado':
+            # Cantidades por producto agrupadas en SQL (values): sin instanciar detalles, y
+            # leídas después del lock en lugar de los detalles cargados por get_object()
+            devoluciones = dict(
+                OrderDetail.objects.filter(pedido_id=order.pk).values('producto_id').annotate(
+                    cantidad_total=Sum('cantidad')
+                ).values_list('producto_id', 'cantidad_total')
+            )
+            _sumar_stock('stock', devoluciones)
+        # 2) Eliminar pagos y pedido. Los pagos abiertos no se marcan antes como
+        #    fallidos: se borran en el mismo DELETE y fail() no tiene otros efectos
         Pay.objects.filter(pedido=order).delete()
         order.delete()
         return Response({'status': 'pedido eliminado'}, status=status.HTTP_200_OK)
     
-class CartViewSet(viewsets.ModelViewSet):
+class CartViewSet(AutoPrefetchViewSetMixin, viewsets.ModelViewSet):
     """
     ViewSet para gestionar el carrito de compras.
     - Cada usuario solo puede ver y modificar su propio carrito
@@ -346,38 +531,64 @@ class CartViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """Retorna solo el carrito del usuario actual"""
-        return Cart.objects.filter(usuario=self.request.user)
+        return Cart.objects.filter(usuario=self.request.user).annotate(
+            # Totales calculados en la base de datos (ver CartSerializer)
+            _total=Coalesce(
+                Sum(F('items__cantidad') * F('items__producto__precio')),
+                Value(0),
+                output_field=DecimalField(max_digits=10, decimal_places=2)
+            ),
+            _cantidad_items=Coalesce(Sum('items__cantidad'), Value(0))
+        ).prefetch_related(
+            Prefetch('items', queryset=CartItem.objects.select_related('producto__categoria'))
+        )
+    
+    def _get_cart(self):
+        """Carrito del usuario con sus ítems precargados; se crea si todavía no existe"""
+        carrito = self.get_queryset().first()
+        if carrito is None:
+            carrito, created = Cart.objects.get_or_create(usuario=self.request.user)
+        return carrito
     
     def list(self, request):
         """Obtener detalles del carrito actual del usuario"""
-        carrito, created = Cart.objects.get_or_create(usuario=request.user)
+        carrito = self._get_cart()
         serializer = self.get_serializer(carrito)
         return Response(serializer.data)
     
     @action(detail=False, methods=['post'])
     def clear(self, request):
         """Vaciar el carrito"""
-        carrito, created = Cart.objects.get_or_create(usuario=request.user)
+        carrito = self._get_cart()
         carrito.limpiar()
         return Response({'mensaje': 'Carrito vaciado correctamente'}, status=status.HTTP_200_OK)
     
     @action(detail=False, methods=['post'])
+    @transaction.atomic
     def checkout(self, request):
         """Convertir carrito en pedido"""
-        carrito, created = Cart.objects.get_or_create(usuario=request.user)
+        carrito = self._get_cart()
+        items = list(carrito.items.all())
         
         # Verificar que el carrito no esté vacío
-        if carrito.items.count() == 0:
+        if not items:
             return Response(
                 {'error': 'El carrito está vacío'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Verificar stock disponible para todos los productos (primer chequeo)
-        for item in carrito.items.all():
-            if item.cantidad > item.producto.stock_disponible:
+        # Bloquear los productos del carrito hasta el final de la transacción:
+        # dos checkouts concurrentes no pueden vender el mismo stock
+        productos = Product.objects.select_for_update().in_bulk({item.producto_id for item in items})
+        
+        # Verificar stock disponible para todos los productos en una sola pasada
+        vendidos = {}
+        for item in items:
+            producto = productos[item.producto_id]
+            vendidos[producto.id] = vendidos.get(producto.id, 0) + item.cantidad
+            if vendidos[producto.id] > producto.stock_disponible:
                 return Response(
-                    {'error': f'Stock insuficiente para {item.producto.nombre}. Solo hay {item.producto.stock_disponible} unidades disponibles'}, 
+                    {'error': f'Stock insuficiente para {producto.nombre}. Solo hay {producto.stock_disponible} unidades disponibles'}, 
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
@@ -387,35 +598,22 @@ class CartViewSet(viewsets.ModelViewSet):
         pedido = Order.objects.create(
             usuario=request.user,
             estado='pendiente',
-            total=carrito.total(),
+            total=sum(item.cantidad * productos[item.producto_id].precio for item in items),
             direccion_envio=direccion_cliente
         )
         
-        # Transferir items del carrito al pedido (segundo chequeo y reducción de stock)
-        for item in carrito.items.all():
-            # Refrescar el producto desde la base de datos para obtener stock actualizado
-            item.producto.refresh_from_db()
-            
-            # Verificar stock nuevamente (segundo chequeo)
-            if item.cantidad > item.producto.stock_disponible:
-                # Si falla, eliminar el pedido creado y retornar error
-                pedido.delete()
-                return Response(
-                    {'error': f'Stock insuficiente para {item.producto.nombre}. Solo hay {item.producto.stock_disponible} unidades disponibles'}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Crear el detalle del pedido
-            OrderDetail.objects.create(
+        # Crear los detalles del pedido en bloque
+        OrderDetail.objects.bulk_create([
+            OrderDetail(
                 pedido=pedido,
-                producto=item.producto,
+                producto=productos[item.producto_id],
                 cantidad=item.cantidad,
-                subtotal=item.cantidad * item.producto.precio
-            )
-            
-            # Incrementar stock vendido
-            item.producto.stock_vendido += item.cantidad
-            item.producto.save()
+                subtotal=item.cantidad * productos[item.producto_id].precio
+            ) for item in items
+        ])
+        
+        # Incrementar stock vendido de todos los productos en un único UPDATE
+        _sumar_stock('stock_vendido', vendidos)
         
         # Vaciar el carrito
         carrito.limpiar()
@@ -423,37 +621,53 @@ class CartViewSet(viewsets.ModelViewSet):
         return Response({
             'mensaje': 'Pedido creado correctamente',
             'pedido_id': pedido.id,
-            'total': float(pedido.total)
+            'total': _monto(pedido.total)
         }, status=status.HTTP_201_CREATED)
 
 class PayViewSet(viewsets.ModelViewSet):
     """Pagos y acciones de simulación (completar / fallar)."""
-    queryset = Pay.objects.select_related('pedido', 'pedido__usuario')
+    # El total del pedido llega ya convertido a float desde la base (ver PedidoBriefSerializer)
+    queryset = Pay.objects.prefetch_related(
+        Prefetch(
+            'pedido',
+            queryset=Order.objects.select_related('usuario').annotate(
+                _total_float=Cast('total', FloatField())
+            )
+        )
+    )
     serializer_class = PaySerializer
     permission_classes = [PaymentPermission]
     parser_classes = [JSONParser, MultiPartParser, FormParser]
 
     def get_queryset(self):
         user = self.request.user
-        qs = super().get_queryset()
+        # Un único filter(): los criterios se arman en un dict y se compilan juntos
+        filtros = {}
         estado = self.request.query_params.get('estado')
         if estado:
-            qs = qs.filter(estado=estado)
-        if getattr(user, 'role', None) not in ['admin', 'operator'] and self.action == 'list':
-            qs = qs.filter(pedido__usuario=user)
+            filtros['estado'] = estado
+        if getattr(user, 'role', None) not in STAFF_ROLES and self.action == 'list':
+            filtros['pedido__usuario'] = user
         pedido_id = self.request.query_params.get('pedido')
         if pedido_id:
-            qs = qs.filter(pedido_id=pedido_id)
-        return qs
+            filtros['pedido_id'] = pedido_id
+        # super() conserva el Prefetch del pedido (con su usuario y el total anotado)
+        qs = super().get_queryset()
+        return qs.filter(**filtros) if filtros else qs
 
+    @transaction.atomic
     def perform_create(self, serializer):
-        pedido = serializer.validated_data.get('pedido')
+        # Bloquear el pedido: dos pagos concurrentes del mismo pedido no pueden quedar ambos abiertos
+        try:
+            pedido = Order.objects.select_for_update().get(pk=serializer.validated_data['pedido'].pk)
+        except Order.DoesNotExist:
+            raise serializers.ValidationError('Pedido no encontrado')
         user = self.request.user
-        if getattr(user, 'role', None) not in ['admin', 'operator'] and pedido.usuario != user:
+        if getattr(user, 'role', None) not in STAFF_ROLES and pedido.usuario_id != user.pk:
             raise serializers.ValidationError('No puedes crear pagos para pedidos ajenos')
         if pedido.estado not in ['pendiente']:
             raise serializers.ValidationError(f"No se puede pagar un pedido en estado '{pedido.estado}'")
-        serializer.save()
+        serializer.save(pedido=pedido)
 
     @action(detail=True, methods=['post'])
     def complete(self, request, pk=None):
@@ -461,8 +675,9 @@ class PayViewSet(viewsets.ModelViewSet):
         if pago.estado not in ['pendiente','en_revision']:
             return Response({'error': 'Solo se puede completar un pago pendiente o en revisión'}, status=status.HTTP_400_BAD_REQUEST)
         # Solo admin/operator pueden completar (aprobar) directamente
-        if getattr(request.user, 'role', None) not in ['admin', 'operator']:
-            return Response({'error': 'No autorizado'}, status=status.HTTP_403_FORBIDDEN)
+        denegado = _require_staff(request)
+        if denegado is not None:
+            return denegado
         pago.complete()
         ser = self.get_serializer(pago)
         return Response(ser.data)
@@ -473,7 +688,7 @@ class PayViewSet(viewsets.ModelViewSet):
         if pago.estado not in ['pendiente','en_revision']:
             return Response({'error': 'Solo se puede fallar un pago pendiente o en revisión'}, status=status.HTTP_400_BAD_REQUEST)
         # Permitir al dueño o staff
-        if getattr(request.user, 'role', None) not in ['admin', 'operator'] and pago.pedido.usuario != request.user:
+        if getattr(request.user, 'role', None) not in STAFF_ROLES and pago.pedido.usuario != request.user:
             return Response({'error': 'No autorizado'}, status=status.HTTP_403_FORBIDDEN)
         pago.fail()
         ser = self.get_serializer(pago)
@@ -483,25 +698,27 @@ class PayViewSet(viewsets.ModelViewSet):
     def review(self, request, pk=None):
         """Marcar un pago como 'en revisión' (admin/operator)."""
         pago = self.get_object()
-        if getattr(request.user, 'role', None) not in ['admin', 'operator']:
-            return Response({'error': 'No autorizado'}, status=status.HTTP_403_FORBIDDEN)
+        denegado = _require_staff(request)
+        if denegado is not None:
+            return denegado
         if pago.estado not in ['pendiente']:
             return Response({'error': 'Solo se puede pasar a revisión un pago pendiente'}, status=status.HTTP_400_BAD_REQUEST)
         pago.estado = 'en_revision'
-        pago.save()
+        pago.save(update_fields=['estado', 'actualizado'])
         # Mantener consistencia: si el pedido estaba 'pendiente', también pasarlo a 'en_revision'
         pedido = pago.pedido
         if pedido and pedido.estado == 'pendiente':
             pedido.estado = 'en_revision'
-            pedido.save()
+            pedido.save(update_fields=['estado'])
         return Response(self.get_serializer(pago).data)
 
     @action(detail=True, methods=['post'])
     def approve(self, request, pk=None):
         """Aprobar un pago en revisión (admin/operator)."""
         pago = self.get_object()
-        if getattr(request.user, 'role', None) not in ['admin', 'operator']:
-            return Response({'error': 'No autorizado'}, status=status.HTTP_403_FORBIDDEN)
+        denegado = _require_staff(request)
+        if denegado is not None:
+            return denegado
         if pago.estado != 'en_revision':
             return Response({'error': 'Solo se puede aprobar un pago en revisión'}, status=status.HTTP_400_BAD_REQUEST)
         pago.complete()
@@ -511,8 +728,9 @@ class PayViewSet(viewsets.ModelViewSet):
     def reject(self, request, pk=None):
         """Rechazar un pago en revisión (admin/operator)."""
         pago = self.get_object()
-        if getattr(request.user, 'role', None) not in ['admin', 'operator']:
-            return Response({'error': 'No autorizado'}, status=status.HTTP_403_FORBIDDEN)
+        denegado = _require_staff(request)
+        if denegado is not None:
+            return denegado
         if pago.estado != 'en_revision':
             return Response({'error': 'Solo se puede rechazar un pago en revisión'}, status=status.HTTP_400_BAD_REQUEST)
         pago.fail()
@@ -520,7 +738,7 @@ class PayViewSet(viewsets.ModelViewSet):
         pedido = pago.pedido
         if pedido and pedido.estado == 'en_revision':
             pedido.estado = 'pendiente'
-            pedido.save()
+            pedido.save(update_fields=['estado'])
         return Response(self.get_serializer(pago).data)
 
     @action(detail=True, methods=['post'], parser_classes=[JSONParser, MultiPartParser, FormParser])
@@ -528,7 +746,7 @@ class PayViewSet(viewsets.ModelViewSet):
         """Cliente o admin sube/declara comprobante; pasa el pago a 'en_revision'."""
         pago = self.get_object()
         # Dueño o staff
-        if getattr(request.user, 'role', None) not in ['admin', 'operator'] and pago.pedido.usuario != request.user:
+        if getattr(request.user, 'role', None) not in STAFF_ROLES and pago.pedido.usuario != request.user:
             return Response({'error': 'No autorizado'}, status=status.HTTP_403_FORBIDDEN)
         if pago.estado not in ['pendiente']:
             return Response({'error': 'Solo se puede adjuntar comprobante a pagos pendientes'}, status=status.HTTP_400_BAD_REQUEST)
@@ -541,15 +759,15 @@ class PayViewSet(viewsets.ModelViewSet):
         if url:
             pago.comprobante_url = url
         pago.estado = 'en_revision'
-        pago.save()
+        pago.save(update_fields=['estado', 'comprobante_archivo', 'comprobante_url', 'actualizado'])
         # Marcar también el pedido como en revisión
         if pago.pedido.estado == 'pendiente':
             pedido = pago.pedido
             pedido.estado = 'en_revision'
-            pedido.save()
+            pedido.save(update_fields=['estado'])
         return Response(self.get_serializer(pago).data)
 
-class ShipmentViewSet(viewsets.ModelViewSet):
+class ShipmentViewSet(AutoPrefetchViewSetMixin, ExportMixin, viewsets.ModelViewSet):
     """
     ViewSet para envíos.
     - Admin y operadores: acceso completo a todos los envíos
@@ -562,9 +780,26 @@ class ShipmentViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         """Filtra para que clientes vean solo envíos de sus órdenes"""
         user = self.request.user
-        if user.role in ['admin', 'operator']:
-            return Shipment.objects.all()
-        return Shipment.objects.filter(pedido__usuario=user)
+        # Precargar pedido, cliente y productos para evitar N+1 en pedido_detalle.
+        # El total del pedido y la cantidad de productos llegan calculados desde la base
+        queryset = Shipment.objects.prefetch_related(
+            Prefetch(
+                'pedido',
+                queryset=Order.objects.select_related('usuario').annotate(
+                    _total_float=Cast('total', FloatField()),
+                    _total_productos=Count('detalles')
+                )
+            ),
+            Prefetch(
+                'pedido__detalles',
+                queryset=OrderDetail.objects.select_related('producto').only(
+                    'id', 'pedido', 'producto', 'cantidad', 'producto__nombre'
+                )
+            )
+        )
+        if user.role in STAFF_ROLES:
+            return queryset
+        return queryset.filter(pedido__usuario=user)
     
     @action(detail=True, methods=['get'], permission_classes=[TrackingPermission])
     def tracking(self, request, pk=None):
@@ -582,8 +817,9 @@ class ShipmentViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'], permission_classes=[])  # Sin permisos
     def update_status(self, request, pk=None):
         """Endpoint para actualizar el estado del envío (solo admin/operator)"""
-        if not request.user.role in ['admin', 'operator']:
-            return Response({'error': 'No autorizado'}, status=status.HTTP_403_FORBIDDEN)
+        denegado = _require_staff(request)
+        if denegado is not None:
+            return denegado
             
         shipment = self.get_object()
         nuevo_estado = request.data.get('estado')
@@ -598,14 +834,14 @@ class ShipmentViewSet(viewsets.ModelViewSet):
         # Si se marca como enviado, actualizar también el pedido
         if nuevo_estado == 'en camino' and shipment.pedido.estado != 'enviado':
             shipment.pedido.estado = 'enviado'
-            shipment.pedido.save()
+            shipment.pedido.save(update_fields=['estado'])
             
         # Si se marca como entregado, actualizar también el pedido
         if nuevo_estado == 'entregado' and shipment.pedido.estado != 'entregado':
             shipment.pedido.estado = 'entregado'
-            shipment.pedido.save()
+            shipment.pedido.save(update_fields=['estado'])
             
-        shipment.save()
+        shipment.save(update_fields=['estado'])
         return Response({'status': 'Estado de envío actualizado'}, status=status.HTTP_200_OK)
 
 class CartItemViewSet(viewsets.ModelViewSet):
@@ -618,15 +854,17 @@ class CartItemViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """Retorna solo los items del carrito del usuario actual"""
-        return CartItem.objects.filter(carrito__usuario=self.request.user)
+        return CartItem.objects.filter(carrito__usuario=self.request.user).select_related(
+            'producto__categoria', 'carrito'
+        )
     
     def list(self, request, *args, **kwargs):
         """Lista todos los items del carrito del usuario"""
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
+        items = list(self.get_queryset())
+        serializer = self.get_serializer(items, many=True)
         return Response({
             'items': serializer.data,
-            'total_items': queryset.count()
+            'total_items': len(items)
         })
     
     def retrieve(self, request, *args, **kwargs):
@@ -669,7 +907,7 @@ class CartItemViewSet(viewsets.ModelViewSet):
         
         # Actualizar cantidad
         instance.cantidad = cantidad
-        instance.save()
+        instance.save(update_fields=['cantidad'])
         
         # Serializar la respuesta
         serializer = self.get_serializer(instance)
@@ -678,7 +916,7 @@ class CartItemViewSet(viewsets.ModelViewSet):
             'mensaje': 'Cantidad actualizada exitosamente',
             'item': serializer.data,
             'nueva_cantidad': instance.cantidad,
-            'subtotal': float(instance.subtotal())
+            'subtotal': _monto(instance.subtotal())
         }, status=status.HTTP_200_OK)
     
     def destroy(self, request, *args, **kwargs):
@@ -694,7 +932,8 @@ class CartItemViewSet(viewsets.ModelViewSet):
             'item_eliminado': True
         }, status=status.HTTP_200_OK)
 
-class FavoriteViewSet(viewsets.ModelViewSet):
+@method_decorator(vary_on_headers('Authorization'), name='list')
+class FavoriteViewSet(AutoPrefetchViewSetMixin, viewsets.ModelViewSet):
     """
     Favoritos del usuario.
     - Clientes: solo sus favoritos.
@@ -702,11 +941,15 @@ class FavoriteViewSet(viewsets.ModelViewSet):
     """
     serializer_class = FavoriteSerializer
     permission_classes = [IsAuthenticated, IsOwnerOrStaff]
+    pagination_class = FavoriteCursorPagination
 
     def get_queryset(self):
         user = self.request.user
-        qs = Favorite.objects.select_related('product')
-        if getattr(user, 'role', None) in ['admin', 'operator']:
+        # Solo las columnas que usa ProductBriefSerializer: evita traer descripcion, imagenes, etc.
+        qs = Favorite.objects.select_related('product').only(
+            'id', 'user', 'created_at', 'product__id', 'product__nombre', 'product__precio'
+        )
+        if getattr(user, 'role', None) in STAFF_ROLES:
             uid = self.request.query_params.get('user')
             return qs.filter(user_id=uid) if uid else qs
         return qs.filter(user=user)
@@ -723,12 +966,15 @@ class FavoriteViewSet(viewsets.ModelViewSet):
         # Permitir DELETE por ?product_id=123 además de /favorites/<id>/
         product_id = request.query_params.get('product_id')
         if product_id:
-            fav = get_object_or_404(Favorite, user=request.user, product_id=product_id)
-            fav.delete()
+            # Un único DELETE: Favorite no tiene señales ni cascadas, Django no carga la fila
+            borrados, _ = Favorite.objects.filter(user=request.user, product_id=product_id).delete()
+            if not borrados:
+                raise Http404('El favorito no existe')
             return Response(status=status.HTTP_204_NO_CONTENT)
         return super().destroy(request, *args, **kwargs)
 
     @action(detail=False, methods=['post'])
+    @transaction.atomic
     def bulk(self, request):
         """
         Fusión de favoritos de invitado al iniciar sesión.
@@ -737,21 +983,38 @@ class FavoriteViewSet(viewsets.ModelViewSet):
         ids = request.data.get('product_ids') or []
         if not isinstance(ids, list):
             return Response({'detail': 'product_ids debe ser una lista'}, status=status.HTTP_400_BAD_REQUEST)
-        created = 0
-        for pid in ids:
-            _, ok = Favorite.objects.get_or_create(user=request.user, product_id=pid)
-            if ok:
-                created += 1
-        return Response({'merged': created}, status=status.HTTP_200_OK)
+        try:
+            ids = {int(pid) for pid in ids}
+        except (TypeError, ValueError):
+            return Response({'detail': 'product_ids debe contener ids numéricos'}, status=status.HTTP_400_BAD_REQUEST)
+        # Una consulta valida los ids contra productos y marca los que ya son favoritos;
+        # los ids inexistentes se descartan en lugar de fallar por la FK
+        productos = Product.objects.filter(pk__in=ids).annotate(
+            es_favorito=Exists(Favorite.objects.filter(user=request.user, product=OuterRef('pk')))
+        ).values_list('pk', 'es_favorito')
+        validos, nuevos = set(), []
+        for pid, es_favorito in productos:
+            validos.add(pid)
+            if not es_favorito:
+                nuevos.append(Favorite(user=request.user, product_id=pid))
+        # ignore_conflicts: la restricción única (user, product) cubre una fusión concurrente
+        Favorite.objects.bulk_create(nuevos, ignore_conflicts=True, batch_size=500)
+        return Response({'merged': len(nuevos), 'skipped': len(ids - validos)}, status=status.HTTP_200_OK)
 
 
 # ============================================================
 # ENDPOINTS PARA SINCRONIZACIÓN DE PRODUCTOS EXTERNOS
 # ============================================================
 
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
+from rest_framework.utils.encoders import JSONEncoder
+from django.http import StreamingHttpResponse
+from Velorum.renderers import ORJSONRenderer, EventStreamRenderer
 from rest_framework.permissions import IsAdminUser
-from market.scraper import sync_external_products
+from market.tasks import (
+    lanzar_sincronizacion, get_sync_status, get_ultima_sincronizacion, sincronizacion_en_curso,
+    seguir_sincronizacion, SYNC_ESTADOS_FINALES
+)
 import logging
 
 logger = logging.getLogger(__name__)
@@ -759,37 +1022,107 @@ logger = logging.getLogger(__name__)
 
 @api_view(['POST'])
 @permission_classes([IsAdminUser])
+@idempotent('manual_sync_products')
 def manual_sync_products(request):
     """
     Endpoint para sincronización manual de productos externos.
     Solo accesible por administradores.
+    La sincronización corre en segundo plano; el estado se consulta en
+    GET /api/market/sync-external/<task_id>/
+    Una sola sincronización a la vez: mientras corre se responde 409.
     
     POST /api/products/sync-external/
+    POST /api/products/sync-external/?cached=1  (último resultado, sin sincronizar)
     
-    Returns:
+    Returns (202):
         {
-            "success": true,
-            "productos_nuevos": 10,
-            "productos_actualizados": 517,
-            "total": 527,
-            "desactivados": 0,
-            "errores": []
+            "task_id": "3f2c..."
         }
     """
     try:
-        logger.info("Sincronización manual iniciada por usuario: " + request.user.username)
-        resultado = sync_external_products()
+        if request.query_params.get('cached'):
+            resultado = get_ultima_sincronizacion()
+            if resultado is None:
+                return Response({'detail': 'No hay una sincronización reciente'}, status=status.HTTP_404_NOT_FOUND)
+            return Response(resultado, status=status.HTTP_200_OK)
         
-        return Response(resultado, status=status.HTTP_200_OK)
+        task_id = lanzar_sincronizacion()
+        if task_id is None:
+            return Response({
+                'detail': 'Ya hay una sincronización en curso',
+                'task_id': sincronizacion_en_curso()
+            }, status=status.HTTP_409_CONFLICT)
+        logger.info("Sincronización manual iniciada por usuario: %s", request.user.username)
+        
+        return Response({'task_id': task_id}, status=status.HTTP_202_ACCEPTED)
         
     except Exception as e:
-        logger.error(f"Error en sincronización manual: {str(e)}")
+        logger.exception("Error en sincronización manual: %s", e)
         return Response({
             'success': False,
             'error': str(e)
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def sync_products_status(request, task_id):
+    """
+    Estado de una sincronización manual.
+    
+    GET /api/market/sync-external/<task_id>/
+    
+    Returns:
+        {
+            "task_id": "3f2c...",
+            "state": "SUCCESS",
+            "result": {"success": true, "productos_nuevos": 10, ...}
+        }
+    """
+    estado = get_sync_status(task_id)
+    if estado is None:
+        return Response({'error': 'Tarea no encontrada'}, status=status.HTTP_404_NOT_FOUND)
+    return Response({'task_id': task_id, **estado}, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+@renderer_classes([ORJSONRenderer, EventStreamRenderer])
+def sync_products_stream(request, task_id):
+    """
+    Progreso de una sincronización manual como Server-Sent Events.
+    Emite un evento por cada cambio de estado (PROGRESS con los contadores
+    nuevos/actualizados/errores por categoría). Tras SUCCESS / FAILURE envía
+    "event: end" para que el EventSource cierre en vez de reconectarse; si la
+    tarea ya había terminado responde 204 (el estado está en el endpoint de status).
+    
+    GET /api/market/sync-external/<task_id>/stream/
+    
+    Eventos:
+        data: {"state": "PROGRESS", "result": {"categoria": "Relojes", "nuevos": 3, ...}}
+        event: end
+        data: SUCCESS
+    """
+    estado = get_sync_status(task_id)
+    if estado is None:
+        return Response({'error': 'Tarea no encontrada'}, status=status.HTTP_404_NOT_FOUND)
+    if estado['state'] in SYNC_ESTADOS_FINALES:
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    response = StreamingHttpResponse(_eventos_sincronizacion(task_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Evita que un proxy (nginx) acumule los eventos en su buffer
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _eventos_sincronizacion(task_id):
+    encoder = JSONEncoder()
+    for estado in seguir_sincronizacion(task_id):
+        yield f'data: {encoder.encode(estado)}\n\n'
+        if estado['state'] in SYNC_ESTADOS_FINALES:
+            yield f'event: end\ndata: {estado["state"]}\n\n'
+
+
 @api_view(['PATCH'])
 @permission_classes([IsAdminUser])
 def update_product_price(request, pk):
@@ -798,6 +1131,7 @@ def update_product_price(request, pk):
     Marca el precio como manual para que el scraper no lo sobrescriba.
     
     PATCH /api/products/<id>/update-price/
+    PATCH /api/products/<id>/update-price/?producto=0  (sin el producto en la respuesta)
     Body: {"precio": 15000}
     
     Returns:
@@ -807,20 +1141,30 @@ def update_product_price(request, pk):
         }
     """
     try:
-        producto = Product.objects.get(pk=pk)
-        nuevo_precio = request.data.get('precio')
-        
-        if not nuevo_precio:
+        # Precio validado como Decimal: una entrada inválida es un 400, no un 500
+        entrada = UpdatePriceSerializer(data=request.data)
+        if not entrada.is_valid():
             return Response({
                 'success': False,
-                'error': 'El campo precio es requerido'
+                'error': entrada.errors
             }, status=status.HTTP_400_BAD_REQUEST)
+        nuevo_precio = entrada.validated_data['precio']
+        
+        # UPDATE directo de las columnas que cambian: sin SELECT previo, y el conteo
+        # de filas indica si el producto existe
+        actualizados = Product.objects.filter(pk=pk).update(
+            precio=nuevo_precio,
+            precio_manual=True,
+            actualizado=timezone.now()
+        )
+        if not actualizados:
+            raise Product.DoesNotExist
+        programar_version_catalogo()
         
-        producto.precio = float(nuevo_precio)
-        producto.precio_manual = True
-        producto.save()
+        if request.query_params.get('producto') == '0':
+            return Response({'success': True}, status=status.HTTP_200_OK)
         
-        serializer = ProductSerializer(producto)
+        serializer = ProductSerializer(Product.objects.get(pk=pk))
         
         return Response({
             'success': True,
@@ -854,13 +1198,18 @@ def reset_stock_vendido(request, pk):
         }
     """
     try:
-        producto = Product.objects.get(pk=pk)
-        producto.stock_vendido = 0
-        producto.save()
+        # Un UPDATE de una columna (atómico por sí mismo) y un SELECT escalar del stock
+        # disponible calculado en la base: no se carga la fila completa
+        if not Product.objects.filter(pk=pk).update(stock_vendido=0, actualizado=timezone.now()):
+            raise Product.DoesNotExist
+        programar_version_catalogo()
+        stock_disponible = Product.objects.con_campos_calculados().filter(pk=pk).values_list(
+            '_stock_disponible', flat=True
+        ).first()
         
         return Response({
             'success': True,
-            'stock_disponible': producto.stock_disponible
+            'stock_disponible': stock_disponible
         }, status=status.HTTP_200_OK)
         
     except Product.DoesNotExist:
@@ -877,6 +1226,7 @@ def reset_stock_vendido(request, pk):
 
 @api_view(['POST'])
 @permission_classes([IsAdminUser])
+@idempotent('bulk_update_markup')
 def bulk_update_markup(request):
     """
     Recalcula los precios de todos los productos con un nuevo markup.
@@ -892,20 +1242,29 @@ def bulk_update_markup(request):
         }
     """
     try:
-        markup_percentage = float(request.data.get('markup_percentage', 100))
-        markup_multiplier = 1 + (markup_percentage / 100)
+        entrada = BulkMarkupSerializer(data=request.data)
+        if not entrada.is_valid():
+            return Response({
+                'success': False,
+                'error': entrada.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+        markup_percentage = entrada.validated_data['markup_percentage']
+        markup_multiplier = 1 + markup_percentage / 100
         
-        # Solo actualizar productos sin precio manual y con precio_proveedor
-        productos = Product.objects.filter(
+        # Solo actualizar productos sin precio manual y con precio_proveedor.
+        # Un único UPDATE: el precio se calcula en la base, sin cargar filas en Python
+        count = Product.objects.filter(
             precio_manual=False,
             precio_proveedor__isnull=False
+        ).update(
+            precio=ExpressionWrapper(
+                F('precio_proveedor') * Value(markup_multiplier),
+                output_field=DecimalField(max_digits=10, decimal_places=2)
+            ),
+            actualizado=timezone.now()
         )
-        
-        count = 0
-        for producto in productos:
-            producto.precio = float(producto.precio_proveedor) * markup_multiplier
-            producto.save()
-            count += 1
+        if count:
+            programar_version_catalogo()
         
         return Response({
             'success': True,
@@ -3,15 +3,17 @@ Script de prueba para verificar la sincronización de productos
 """
 
 import os
-import django
 
-# Configurar Django
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Velorum.settings')
-django.setup()
-
-from market.scraper import sync_external_products
 
 if __name__ == '__main__':
+    # Configurar Django solo al ejecutar el script: importarlo (p. ej. al recolectar
+    # tests) no debe cargar las apps ni los modelos
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Velorum.settings')
+    django.setup()
+    
+    from market.scraper import sync_external_products
+    
     print("🚀 Iniciando prueba de sincronización...")
     print("-" * 60)
     